@@ -0,0 +1,74 @@
+import os
+import re
+import time
+
+ALERT_WINDOW = float(os.getenv('ALERT_WINDOW', 3600))
+DIGEST_INTERVAL = float(os.getenv('DIGEST_INTERVAL', 3600))
+DIGEST_LIMIT = 5
+
+NUMBERS = re.compile(r'\d+')
+
+
+def fingerprint(message):
+    """Отпечаток ошибки: текст без чисел, меняющихся от раза к разу."""
+    return NUMBERS.sub('N', message)
+
+
+class Alerts:
+    """Подавление повторных сообщений об ошибках и сводки по ним.
+
+    Ошибка с тем же отпечатком отправляется не чаще раза в window
+    секунд, подавленные повторы раз в digest_interval секунд сводятся
+    в одно сообщение.
+    """
+
+    def __init__(self, window=ALERT_WINDOW, digest_interval=DIGEST_INTERVAL):
+        self.window = window
+        self.digest_interval = digest_interval
+        self.sent_at = {}
+        self.suppressed = {}
+        self.digest_at = None
+
+    def mark(self, message, now=None):
+        """Запоминаю сообщение как отправленное."""
+        now = time.time() if now is None else now
+        self.sent_at[fingerprint(message)] = now
+
+    def should_send(self, message, now=None):
+        """Нужно ли отправлять сообщение об ошибке; повтор учитываю."""
+        now = time.time() if now is None else now
+        key = fingerprint(message)
+        if self.digest_at is None:
+            self.digest_at = now + self.digest_interval
+        sent_at = self.sent_at.get(key)
+        if sent_at is None or now - sent_at >= self.window:
+            self.mark(message, now)
+            return True
+        self.suppressed[key] = self.suppressed.get(key, 0) + 1
+        return False
+
+    def digest(self, now=None):
+        """Сводка подавленных ошибок, если пришло её время, иначе None."""
+        now = time.time() if now is None else now
+        if self.digest_at is None or now < self.digest_at:
+            return None
+        self.digest_at = None
+        self.sent_at = {
+            key: sent_at for key, sent_at in self.sent_at.items()
+            if now - sent_at < self.window
+        }
+        if not self.suppressed:
+            return None
+        self.digest_at = now + self.digest_interval
+        suppressed, self.suppressed = self.suppressed, {}
+        top = sorted(suppressed.items(), key=lambda item: -item[1])
+        lines = [
+            f'{count} × {key}' for key, count in top[:DIGEST_LIMIT]
+        ]
+        if len(top) > DIGEST_LIMIT:
+            lines.append(f'и ещё видов ошибок: {len(top) - DIGEST_LIMIT}')
+        minutes = round(self.digest_interval / 60)
+        return (
+            f'Повторные ошибки за последние {minutes} мин.:\n'
+            + '\n'.join(lines)
+        )
@@ -0,0 +1,327 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from homework import logger
+
+ANALYTICS_REFRESH_INTERVAL = float(os.getenv('ANALYTICS_REFRESH_INTERVAL', 60))
+ANALYTICS_CACHE = os.getenv(
+    'ANALYTICS_CACHE', 'true'
+).lower() in ('1', 'true', 'yes')
+PERCENTILES = (50, 90, 95)
+HOURS_IN_DAY = 24
+
+# Этапы, которые отмеряются от предыдущего статуса работы.
+WAIT, REVIEW = 0, 1
+STAGES = {
+    WAIT: 'Ожидание ревью (отправка → reviewing)',
+    REVIEW: 'Ревью (reviewing → approved/rejected)',
+}
+# Коды статусов: всё, кроме reviewing и вердиктов, считается отправкой.
+SUBMITTED, REVIEWING, VERDICT = 0, 1, 2
+NOT_FOUND = -1
+
+NO_STATS = 'Данных о сроках проверки пока нет.'
+# Столбцы замеров, которые сохраняются рядом с журналом.
+COLUMNS = ('durations', 'stages', 'projects', 'hours')
+
+Summary = namedtuple('Summary', ['count', 'percentiles'])
+
+
+def project_of(homework_name):
+    """Проект по названию работы: без логина студента и расширения."""
+    project = (homework_name or '').rsplit('__', 1)[-1]
+    return project.rsplit('.', 1)[0] or 'неизвестно'
+
+
+def status_codes(statuses):
+    """Коды статусов для массива строк."""
+    codes = np.full(len(statuses), SUBMITTED, dtype=np.int8)
+    codes[statuses == 'reviewing'] = REVIEWING
+    codes[(statuses == 'approved') | (statuses == 'rejected')] = VERDICT
+    return codes
+
+
+def key_column(keys):
+    """Ключи работ: целые id, а если среди ключей есть названия — строки."""
+    try:
+        return keys.astype(np.int64)
+    except (TypeError, ValueError):
+        return keys.astype(str)
+
+
+def summarize(durations):
+    """Число замеров и их перцентили."""
+    return Summary(
+        len(durations), tuple(np.percentile(durations, PERCENTILES))
+    )
+
+
+def grouped(durations, groups):
+    """Сводки по группам: {код группы: Summary}."""
+    order = np.argsort(groups, kind='stable')
+    codes, starts = np.unique(groups[order], return_index=True)
+    return {
+        int(code): summarize(part) for code, part in zip(
+            codes, np.split(durations[order], starts[1:])
+        )
+    }
+
+
+def format_duration(seconds):
+    """Длительность в минутах, часах или днях."""
+    if seconds < 3600:
+        return f'{seconds / 60:.0f} мин'
+    if seconds < 3600 * 48:
+        return f'{seconds / 3600:.1f} ч'
+    return f'{seconds / 3600 / 24:.1f} дн'
+
+
+def format_summary(title, summary):
+    """Строка отчёта: перцентили и число замеров."""
+    values = ', '.join(
+        f'p{share} {format_duration(value)}'
+        for share, value in zip(PERCENTILES, summary.percentiles)
+    )
+    return f'{title}: {values} (n={summary.count})'
+
+
+class ReviewStats:
+    """Сроки проверки работ по журналу статусов.
+
+    Журнал читается в столбцы NumPy один раз, дальше дочитываются только
+    новые записи. Каждая пара соседних статусов работы даёт замер этапа:
+    отправка → reviewing и reviewing → вердикт. Отчёт кэшируется до
+    появления новых замеров, журнал перечитывается не чаще раза в
+    refresh_interval секунд. При cache столбцы сохраняются рядом с
+    журналом, и после перезапуска дочитываются только новые записи.
+    """
+
+    def __init__(self, history, refresh_interval=ANALYTICS_REFRESH_INTERVAL,
+                 cache=ANALYTICS_CACHE):
+        self.history = history
+        self.refresh_interval = refresh_interval
+        self.cache_path = f'{history.path}.npz' if cache else None
+        self.last_id = 0
+        self.refreshed_at = None
+        self.durations = np.empty(0)
+        self.stages = np.empty(0, dtype=np.int8)
+        self.projects = np.empty(0, dtype=np.int32)
+        self.hours = np.empty(0, dtype=np.int8)
+        self.project_names = []
+        self._project_codes = {}
+        self._name_projects = {}
+        self._tails = {}
+        self._report = None
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self):
+        """Число замеров."""
+        return len(self.durations)
+
+    def refresh(self, now=None):
+        """Дочитываю новые записи журнала, если пришло время.
+
+        Возвращаю число новых замеров.
+        """
+        now = time.monotonic() if now is None else now
+        if (self.refreshed_at is not None
+                and now - self.refreshed_at < self.refresh_interval):
+            return 0
+        self.refreshed_at = now
+        last_id = self.history.last_id()
+        if not self._loaded:
+            self._loaded = True
+            self.load(last_id)
+        if last_id <= self.last_id:
+            return 0
+        rows = self.history.rows_between(self.last_id, last_id)
+        self.last_id = last_id
+        if not rows:
+            return 0
+        tenants, keys, names, statuses, times = np.array(
+            rows, dtype=object
+        ).T
+        added = self.add(
+            tenants.astype(str), key_column(keys), names,
+            status_codes(statuses), times.astype(float)
+        )
+        self.save()
+        return added
+
+    def add(self, tenants, keys, names, codes, times):
+        """Добавляю замеры по записям в порядке их появления.
+
+        Записи группируются по работам устойчивой сортировкой, поэтому
+        внутри работы порядок сохраняется.
+        """
+        order = np.lexsort((tenants, keys))
+        tenants, keys = tenants[order], keys[order]
+        codes, times = codes[order], times[order]
+        starts = np.flatnonzero(np.concatenate((
+            [True], (keys[1:] != keys[:-1]) | (tenants[1:] != tenants[:-1])
+        )))
+        ends = np.append(starts[1:], len(keys)) - 1
+        previous_codes = np.roll(codes, 1)
+        previous_times = np.roll(times, 1)
+        previous_codes[starts] = NOT_FOUND
+        # Первая запись работы в пачке продолжает последнюю из прошлых.
+        # Помню только работы без вердикта: после него замера не будет.
+        if self._tails:
+            for start in starts:
+                tail = self._tails.pop(
+                    (tenants[start], str(keys[start])), None
+                )
+                if tail is not None:
+                    previous_codes[start], previous_times[start] = tail
+        for end in ends[codes[ends] != VERDICT]:
+            self._tails[tenants[end], str(keys[end])] = (
+                codes[end], times[end]
+            )
+
+        wait = (previous_codes == SUBMITTED) & (codes == REVIEWING)
+        review = (previous_codes == REVIEWING) & (codes == VERDICT)
+        measured = wait | review
+        count = int(measured.sum())
+        if not count:
+            return 0
+        projects = np.fromiter(
+            map(self.name_project, names[order[measured]]),
+            dtype=np.int32, count=count
+        )
+        started = previous_times[measured]
+        self.durations = np.concatenate((
+            self.durations, times[measured] - started
+        ))
+        self.stages = np.concatenate((
+            self.stages, np.where(review[measured], REVIEW, WAIT)
+        )).astype(np.int8)
+        self.projects = np.concatenate((self.projects, projects))
+        self.hours = np.concatenate((
+            self.hours, (started // 3600 % HOURS_IN_DAY).astype(np.int8)
+        ))
+        self._report = None
+        return count
+
+    def load(self, last_id):
+        """Загружаю сохранённые столбцы, если они не новее журнала."""
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return
+        try:
+            with np.load(self.cache_path) as cache:
+                cache = dict(cache)
+            if int(cache['last_id']) > last_id:
+                return
+            tails = dict(zip(
+                zip(cache['tail_tenants'].tolist(),
+                    cache['tail_keys'].tolist()),
+                zip(cache['tail_codes'], cache['tail_times'])
+            ))
+            columns = [cache[name] for name in COLUMNS]
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning(f'Кэш сроков проверки не загружен: {error}')
+            return
+        self.last_id = int(cache['last_id'])
+        for name, column in zip(COLUMNS, columns):
+            setattr(self, name, column)
+        self.project_names = cache['project_names'].tolist()
+        self._project_codes = {
+            project: code for code, project in enumerate(self.project_names)
+        }
+        self._tails = tails
+
+    def save(self):
+        """Сохраняю столбцы рядом с журналом, заменяя файл целиком."""
+        if self.cache_path is None:
+            return
+        tails = list(self._tails.items())
+        temporary = f'{self.cache_path}.tmp'
+        try:
+            with open(temporary, 'wb') as file:
+                np.savez(
+                    file, last_id=self.last_id,
+                    project_names=np.array(self.project_names, dtype=str),
+                    tail_tenants=np.array(
+                        [tenant for (tenant, _), _ in tails], dtype=str
+                    ),
+                    tail_keys=np.array(
+                        [key for (_, key), _ in tails], dtype=str
+                    ),
+                    tail_codes=np.array(
+                        [code for _, (code, _) in tails], dtype=np.int8
+                    ),
+                    tail_times=np.array(
+                        [moment for _, (_, moment) in tails], dtype=float
+                    ),
+                    **{name: getattr(self, name) for name in COLUMNS}
+                )
+            os.replace(temporary, self.cache_path)
+        except OSError as error:
+            logger.warning(f'Кэш сроков проверки не сохранён: {error}')
+
+    def name_project(self, name):
+        """Код проекта по названию работы."""
+        code = self._name_projects.get(name)
+        if code is None:
+            code = self.project_code(project_of(name))
+            self._name_projects[name] = code
+        return code
+
+    def project_code(self, project):
+        """Код проекта, новый проект получает следующий код."""
+        code = self._project_codes.get(project)
+        if code is None:
+            code = self._project_codes[project] = len(self.project_names)
+            self.project_names.append(project)
+        return code
+
+    def stats(self):
+        """Сводки по этапам: всего, по проектам и по часам начала."""
+        result = {}
+        for stage in STAGES:
+            selected = self.stages == stage
+            durations = self.durations[selected]
+            if not len(durations):
+                continue
+            result[stage] = {
+                'all': summarize(durations),
+                'projects': {
+                    self.project_names[code]: summary for code, summary in
+                    grouped(durations, self.projects[selected]).items()
+                },
+                'hours': grouped(durations, self.hours[selected]),
+            }
+        return result
+
+    def report(self):
+        """Текст отчёта по свежим данным журнала."""
+        with self._lock:
+            self.refresh()
+            if self._report is None:
+                self._report = self.render(self.stats())
+            return self._report
+
+    @staticmethod
+    def render(stats):
+        """Текст отчёта по сводкам stats()."""
+        if not stats:
+            return NO_STATS
+        lines = []
+        for stage, groups in stats.items():
+            lines.append(format_summary(STAGES[stage], groups['all']))
+            lines.append('По проектам:')
+            lines.extend(
+                format_summary(f'  {project}', summary)
+                for project, summary in sorted(groups['projects'].items())
+            )
+            lines.append('По часам начала (UTC):')
+            lines.extend(
+                format_summary(f'  {hour:02d}:00', summary)
+                for hour, summary in sorted(groups['hours'].items())
+            )
+            lines.append('')
+        return '\n'.join(lines).rstrip()
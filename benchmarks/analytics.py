@@ -0,0 +1,82 @@
+"""Время отчёта о сроках проверки на большом журнале статусов.
+
+Журнал заполняется случайными работами: отправка, reviewing, вердикт.
+Запуск из корня проекта:
+
+    python -m benchmarks.analytics --homeworks 300000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from analytics import ReviewStats
+from history import History
+from validation import Homework
+
+STATUSES = ('submitted', 'reviewing', 'approved')
+PROJECTS = 12
+TENANTS = 5000
+
+
+def fill(history, homeworks, start=0, seed=0):
+    """Дописываю в журнал по три записи на работу."""
+    rng = random.Random(seed)
+    for index in range(start, start + homeworks):
+        tenant = f'tenant-{index % TENANTS}'
+        name = f'student__hw{index % PROJECTS:02d}.zip'
+        moment = 1_600_000_000 + rng.randint(0, 10 ** 7)
+        for status in STATUSES:
+            history.append(tenant, Homework(index, name, status), moment)
+            moment += rng.randint(60, 3600 * 24)
+    history.flush()
+
+
+def timed(function):
+    """Время вызова в секундах."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(path, homeworks, increment):
+    """Холодная загрузка, ответ из кэша, дочитывание и перезапуск."""
+    history = History(path)
+    fill(history, homeworks)
+    stats = ReviewStats(history, refresh_interval=0)
+    results = {'transitions': homeworks * len(STATUSES)}
+    results['cold_report_s'] = timed(stats.report)
+    results['cached_report_s'] = timed(stats.report)
+    fill(history, increment, start=homeworks, seed=1)
+    results['incremental_report_s'] = timed(stats.report)
+    restarted = ReviewStats(history, refresh_interval=0)
+    results['restart_report_s'] = timed(restarted.report)
+    history.close()
+    return results
+
+
+def main():
+    """Точка входа бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--homeworks', type=int, default=300_000)
+    parser.add_argument('--increment', type=int, default=1000,
+                        help='работ, дописанных после первого отчёта')
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(
+            os.path.join(directory, 'history.sqlite3'),
+            args.homeworks, args.increment
+        )
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, value in results.items():
+        print(f'{name:22} {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+HOMEWORK_TEMPLATE = {
+    'status': 'approved',
+    'reviewer_comment': 'Всё нравится',
+    'date_updated': '2020-02-13T14:40:57Z',
+    'lesson_name': 'Итоговый проект',
+}
+
+
+def make_homeworks(count):
+    """Список работ для ответа фейкового API."""
+    return [
+        dict(HOMEWORK_TEMPLATE, id=index, homework_name=f'hw{index}')
+        for index in range(count)
+    ]
+
+
+def make_app(homeworks=None, etag=True):
+    """Приложение, отвечающее как API Практикум.Домашки.
+
+    Тело ответа зависит только от from_date, поэтому на повторный запрос
+    с тем же If-None-Match сервер отвечает 304.
+    """
+    homeworks = make_homeworks(30) if homeworks is None else homeworks
+
+    async def homework_statuses(request):
+        from_date = request.query.get('from_date', '0')
+        body = json.dumps(
+            {'homeworks': homeworks, 'current_date': int(from_date)}
+        ).encode()
+        headers = {}
+        if etag:
+            headers['ETag'] = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if request.headers.get('If-None-Match') == headers['ETag']:
+                return web.Response(status=304, headers=headers)
+        headers['Date'] = time.strftime(
+            '%a, %d %b %Y %H:%M:%S GMT', time.gmtime()
+        )
+        return web.Response(
+            body=body, headers=headers, content_type='application/json'
+        )
+
+    app = web.Application()
+    app.router.add_get(
+        '/api/user_api/homework_statuses/', homework_statuses
+    )
+    return app
+
+
+async def start_server(app, host='127.0.0.1', port=0,
+                       path='/api/user_api/homework_statuses/'):
+    """Запускаю приложение и возвращаю (runner, адрес path на сервере)."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://{host}:{port}{path}'
+
+
+class ScriptedPracticum:
+    """Фейковый API с задержкой, ошибками и сценарием смены статусов.
+
+    У каждого токена token-<i> есть работы; в моменты из сценария (секунды
+    от запуска) их статусы меняются. Ответ содержит работы, обновлённые
+    не раньше from_date, как у настоящего API.
+    """
+
+    def __init__(self, tenants, homeworks=3, changes=2, duration=30,
+                 latency=0.0, error_rate=0.0, seed=0):
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.homeworks = {
+            f'token-{tenant}': [
+                {'id': index, 'homework_name': f'hw{tenant}-{index}',
+                 'status': 'reviewing', 'updated': 0}
+                for index in range(homeworks)
+            ]
+            for tenant in range(tenants)
+        }
+        self.script = sorted(
+            (
+                self.random.uniform(duration * 0.1, duration * 0.9),
+                token, self.random.randrange(homeworks),
+                self.random.choice(['approved', 'rejected'])
+            )
+            for token in self.homeworks for _ in range(changes)
+        )
+        self.applied = []
+
+    def apply_script(self):
+        """Применяю наступившие события сценария."""
+        now = time.time()
+        while self.script and self.started + self.script[0][0] <= now:
+            _, token, index, status = self.script.pop(0)
+            homework = self.homeworks[token][index]
+            if homework['status'] == status:
+                continue
+            homework['status'] = status
+            homework['updated'] = now
+            self.applied.append({
+                'token': token, 'homework_name': homework['homework_name'],
+                'status': status, 'time': now,
+            })
+
+    async def homework_statuses(self, request):
+        """Обработчик эндпоинта homework_statuses."""
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=500)
+        token = request.headers.get('Authorization', '')[len('OAuth '):]
+        if token not in self.homeworks:
+            return web.Response(status=401)
+        self.apply_script()
+        from_date = int(request.query.get('from_date', 0))
+        homeworks = [
+            {key: value for key, value in homework.items()
+             if key != 'updated'}
+            for homework in reversed(self.homeworks[token])
+            if homework['updated'] >= from_date
+        ]
+        return web.json_response(
+            {'homeworks': homeworks, 'current_date': int(time.time())}
+        )
+
+    async def stats(self, request):
+        """Счётчики запросов и применённые изменения статусов."""
+        return web.json_response({
+            'requests': self.requests, 'errors': self.errors,
+            'changes': self.applied,
+        })
+
+    def make_app(self):
+        """Приложение aiohttp с эндпоинтами API и статистики."""
+        app = web.Application()
+        app.router.add_get(
+            '/api/user_api/homework_statuses/', self.homework_statuses
+        )
+        app.router.add_get('/stats', self.stats)
+        return app
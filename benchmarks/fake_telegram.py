@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    """Фейковый Bot API: принимает sendMessage и запоминает время прихода.
+
+    Боту нужно передать base_url=<адрес сервера>/bot.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = []
+        self.message_id = 0
+
+    async def send_message(self, request):
+        """Обработчик метода sendMessage."""
+        data = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.message_id += 1
+        self.messages.append({
+            'chat_id': data['chat_id'], 'text': data['text'],
+            'time': time.time(),
+        })
+        return web.json_response({'ok': True, 'result': {
+            'message_id': self.message_id, 'date': int(time.time()),
+            'chat': {'id': int(data['chat_id']), 'type': 'private'},
+            'text': data['text'],
+        }})
+
+    async def stats(self, request):
+        """Принятые сообщения."""
+        return web.json_response({'messages': self.messages})
+
+    def make_app(self):
+        """Приложение aiohttp с методом sendMessage и статистикой."""
+        app = web.Application()
+        app.router.add_post('/bot{token}/sendMessage', self.send_message)
+        app.router.add_get('/stats', self.stats)
+        return app
@@ -0,0 +1,111 @@
+"""Сравнение стоимости опроса: новое соединение, пул и условные запросы.
+
+Фейковый API запускается в отдельном процессе, чтобы процессорное время
+клиента измерялось отдельно от сервера. Запуск из корня проекта:
+
+    python -m benchmarks.http_pool --polls 500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import statistics
+import time
+
+import aiohttp
+
+import engine
+from benchmarks.fake_practicum import make_app, make_homeworks, start_server
+
+
+def serve(homeworks, queue):
+    """Процесс фейкового API: сообщаю адрес и работаю до завершения."""
+    async def main():
+        _, url = await start_server(make_app(make_homeworks(homeworks)))
+        queue.put(url)
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+async def poll_fresh(url, polls):
+    """Каждый опрос на новом соединении, как requests.get."""
+    for _ in range(polls):
+        connector = aiohttp.TCPConnector(force_close=True)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            start = time.perf_counter()
+            await engine.fetch_api_answer(session, 'token', 0, None, url)
+            yield time.perf_counter() - start
+
+
+async def poll_pooled(url, polls, conditional=False):
+    """Опросы через общий пул keep-alive соединений."""
+    validators = {} if conditional else None
+    async with engine.make_session() as session:
+        for _ in range(polls):
+            start = time.perf_counter()
+            await engine.fetch_api_answer(
+                session, 'token', 0, validators, url
+            )
+            yield time.perf_counter() - start
+
+
+async def measure(polls_iterator):
+    """Задержки опросов и процессорное время клиента на один опрос."""
+    cpu = time.process_time()
+    latencies = [latency async for latency in polls_iterator]
+    cpu = time.process_time() - cpu
+    latencies.sort()
+    return {
+        'polls': len(latencies),
+        'latency_mean_ms': statistics.mean(latencies) * 1000,
+        'latency_p50_ms': latencies[len(latencies) // 2] * 1000,
+        'latency_p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        'cpu_per_poll_ms': cpu / len(latencies) * 1000,
+    }
+
+
+async def run(url, polls):
+    """Прогоняю все режимы опроса подряд."""
+    return {
+        'fresh_connection': await measure(poll_fresh(url, polls)),
+        'pooled': await measure(poll_pooled(url, polls)),
+        'pooled_conditional': await measure(
+            poll_pooled(url, polls, conditional=True)
+        ),
+    }
+
+
+def main():
+    """Точка входа бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--polls', type=int, default=500)
+    parser.add_argument('--homeworks', type=int, default=30)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+    engine.logger.setLevel(logging.WARNING)
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve, args=(args.homeworks, queue), daemon=True
+    )
+    server.start()
+    try:
+        results = asyncio.run(run(queue.get(timeout=10), args.polls))
+    finally:
+        server.terminate()
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, result in results.items():
+        print(
+            f'{mode:20} mean {result["latency_mean_ms"]:7.3f} ms  '
+            f'p95 {result["latency_p95_ms"]:7.3f} ms  '
+            f'cpu {result["cpu_per_poll_ms"]:7.3f} ms/poll'
+        )
+
+
+if __name__ == '__main__':
+    main()
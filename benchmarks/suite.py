@@ -0,0 +1,239 @@
+"""Сквозной бенчмарк движка на фейковых API Практикума и Телеграма.
+
+Измеряет число опросов в секунду, задержку от смены статуса на сервере
+до прихода уведомления и память на одного студента. Фейковые серверы
+работают в отдельном процессе. Запуск из корня проекта:
+
+    python -m benchmarks.suite --tenants 1000 --duration 30 \
+        --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import platform
+import statistics
+import time
+import tracemalloc
+from urllib.request import urlopen
+
+import telegram
+from telegram.utils.request import Request
+
+import engine
+from benchmarks.fake_practicum import ScriptedPracticum, start_server
+from benchmarks.fake_telegram import FakeTelegram
+from homework import HOMEWORK_VERDICTS
+from ratelimit import ApiLimiter
+from scheduler import Scheduler
+from sender import TelegramSender
+from singleflight import SingleFlight
+
+CHAT_ID_BASE = 1000
+
+
+def serve(config, queue):
+    """Процесс фейковых серверов: сообщаю адреса и работаю до завершения."""
+    async def main():
+        practicum = ScriptedPracticum(
+            config['tenants'], changes=config['changes'],
+            duration=config['duration'], latency=config['api_latency'],
+            error_rate=config['error_rate'], seed=config['seed'],
+        )
+        _, endpoint = await start_server(practicum.make_app())
+        _, telegram_url = await start_server(
+            FakeTelegram(config['telegram_latency']).make_app(), path='/bot'
+        )
+        queue.put((endpoint, telegram_url))
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def fetch_stats(url):
+    """Статистика фейкового сервера."""
+    base = url.split('/', 3)[:3]
+    with urlopen('/'.join(base) + '/stats') as response:
+        return json.load(response)
+
+
+def make_jobs(tenants):
+    """Задачи опроса для студентов фейкового API."""
+    return [
+        engine.PollJob(str(index), f'token-{index}', CHAT_ID_BASE + index)
+        for index in range(tenants)
+    ]
+
+
+def make_bot(telegram_url, workers):
+    """Бот, который отправляет сообщения в фейковый Телеграм."""
+    return telegram.Bot(
+        '123:benchmark', base_url=telegram_url,
+        request=Request(con_pool_size=workers + 4)
+    )
+
+
+def make_api_limiter(config):
+    """Ограничитель запросов к API; 0 — без ограничения."""
+    rate = config['api_rate']
+    return ApiLimiter(global_rate=rate, global_burst=rate, token_rate=0)
+
+
+async def measure_memory(config, endpoint, telegram_url):
+    """Память на студента после первого опроса каждого из них."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    jobs = make_jobs(config['tenants'])
+    poller = engine.Engine(
+        make_bot(telegram_url, 1), jobs, endpoint=endpoint,
+        api_limiter=make_api_limiter(config)
+    )
+    poller.sender.start()
+    async with engine.make_session() as session:
+        poller.session = session
+        semaphore = asyncio.Semaphore(config['concurrency'])
+
+        async def poll(job):
+            async with semaphore:
+                await poller.poll(job)
+
+        await asyncio.gather(*(poll(job) for job in jobs))
+    await poller.sender.stop()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff for stat in after.compare_to(before, 'filename')
+    )
+    return allocated / config['tenants']
+
+
+async def measure_throughput(config, endpoint, telegram_url):
+    """Прогон движка в течение duration секунд."""
+    interval = config['interval']
+    bot = make_bot(telegram_url, config['sender_workers'])
+    poller = engine.Engine(
+        bot, make_jobs(config['tenants']),
+        sender=TelegramSender(
+            bot, workers=config['sender_workers'],
+            global_rate=config['telegram_rate']
+        ),
+        scheduler=Scheduler(
+            interval=interval, min_interval=0, max_interval=interval,
+            budget=0
+        ),
+        max_concurrent=config['concurrency'], endpoint=endpoint,
+        api_limiter=make_api_limiter(config),
+        # Замеряется движок, а не кэш ответов API.
+        flights=SingleFlight(ttl=0)
+    )
+    try:
+        await asyncio.wait_for(poller.run(), config['duration'])
+    except asyncio.TimeoutError:
+        pass
+
+
+def percentile(values, share):
+    """Перцентиль отсортированного списка."""
+    if not values:
+        return None
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def notification_latencies(changes, messages):
+    """Задержки от смены статуса до первого уведомления о ней."""
+    arrivals = {}
+    for message in messages:
+        arrivals.setdefault(str(message['chat_id']), []).append(message)
+    latencies = []
+    for change in changes:
+        chat_id = str(CHAT_ID_BASE + int(change['token'].split('-')[1]))
+        for message in arrivals.get(chat_id, []):
+            # Сообщение может описывать несколько работ, по строке на каждую.
+            if message['time'] >= change['time'] and any(
+                f'"{change["homework_name"]}"' in line
+                and line.endswith(HOMEWORK_VERDICTS[change['status']])
+                for line in message['text'].splitlines()
+            ):
+                latencies.append(message['time'] - change['time'])
+                break
+    return sorted(latencies)
+
+
+def run(config):
+    """Запускаю серверы и все замеры, возвращаю результаты."""
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve, args=(config, queue), daemon=True
+    )
+    server.start()
+    try:
+        endpoint, telegram_url = queue.get(timeout=30)
+        memory = asyncio.run(measure_memory(config, endpoint, telegram_url))
+        requests_before = fetch_stats(endpoint)['requests']
+        started = time.perf_counter()
+        asyncio.run(measure_throughput(config, endpoint, telegram_url))
+        elapsed = time.perf_counter() - started
+        practicum = fetch_stats(endpoint)
+        messages = fetch_stats(telegram_url)['messages']
+    finally:
+        server.terminate()
+    latencies = notification_latencies(practicum['changes'], messages)
+    return {
+        'polls': practicum['requests'] - requests_before,
+        'polls_per_second': (
+            (practicum['requests'] - requests_before) / elapsed
+        ),
+        'api_errors': practicum['errors'],
+        'status_changes': len(practicum['changes']),
+        'notifications': len(latencies),
+        'notification_latency_p50_s': percentile(latencies, 0.5),
+        'notification_latency_p95_s': percentile(latencies, 0.95),
+        'notification_latency_mean_s': (
+            statistics.mean(latencies) if latencies else None
+        ),
+        'memory_per_tenant_bytes': memory,
+    }
+
+
+def main():
+    """Точка входа бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=2,
+                        help='интервал опроса студента, с')
+    parser.add_argument('--changes', type=int, default=1,
+                        help='смен статуса на студента за прогон')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--sender-workers', type=int, default=4)
+    parser.add_argument('--telegram-rate', type=float, default=30,
+                        help='общий лимит отправки, сообщений в секунду')
+    parser.add_argument('--api-rate', type=float, default=0,
+                        help='общий лимит запросов к API в секунду, 0 — нет')
+    parser.add_argument('--api-latency', type=float, default=0.0)
+    parser.add_argument('--telegram-latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+    engine.logger.setLevel(logging.CRITICAL)
+
+    config = vars(args).copy()
+    output = config.pop('output')
+    report = {
+        'benchmark': 'suite',
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'config': config,
+        'results': run(config),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import time
+from collections import deque
+
+from homework import logger
+
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', 20))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 10))
+BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+BREAKER_SLOW_CALL = float(os.getenv('BREAKER_SLOW_CALL', 10))
+BREAKER_OPEN_TIME = float(os.getenv('BREAKER_OPEN_TIME', 60))
+BREAKER_PROBES = int(os.getenv('BREAKER_PROBES', 1))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для запросов к API.
+
+    В закрытом состоянии учитывает последние window запросов: признаки
+    недоступности API и запросы дольше slow_call считаются неудачными.
+    Если их доля не меньше failure_rate, цепь размыкается на open_time
+    секунд, и запросы не делаются. Затем пропускается probes пробных
+    запросов: успех замыкает цепь, неудача снова размыкает.
+    """
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE,
+                 slow_call=BREAKER_SLOW_CALL, open_time=BREAKER_OPEN_TIME,
+                 probes=BREAKER_PROBES):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_time = open_time
+        self.probes = probes
+        self.state = CLOSED
+        self.opened_at = None
+        self.in_flight = 0
+        self._results = deque(maxlen=window)
+
+    @property
+    def is_open(self):
+        """Разомкнута ли цепь, включая пробный режим."""
+        return self.state != CLOSED
+
+    def allow(self, now=None):
+        """Можно ли сейчас делать запрос."""
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN and now - self.opened_at >= self.open_time:
+            self.state = HALF_OPEN
+            self.in_flight = 0
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.in_flight < self.probes:
+            self.in_flight += 1
+            return True
+        return False
+
+    def release(self):
+        """Освобождаю место пробного запроса, который так и не был сделан."""
+        if self.state == HALF_OPEN:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def record(self, success, duration=0, now=None):
+        """Учитываю результат запроса."""
+        now = time.monotonic() if now is None else now
+        success = success and duration < self.slow_call
+        if self.state == HALF_OPEN:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if success:
+                self.close()
+            else:
+                self.open(now)
+            return
+        if self.state == OPEN:
+            return
+        self._results.append(success)
+        failures = self._results.count(False)
+        if (len(self._results) >= self.min_calls
+                and failures >= self.failure_rate * len(self._results)):
+            self.open(now)
+
+    def open(self, now):
+        """Размыкаю цепь."""
+        if self.state != OPEN:
+            logger.warning('API недоступно: запросы приостановлены')
+        self.state = OPEN
+        self.opened_at = now
+
+    def close(self):
+        """Замыкаю цепь и забываю прошлые результаты."""
+        logger.info('API снова отвечает: запросы возобновлены')
+        self.state = CLOSED
+        self._results.clear()
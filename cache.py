@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class TTLCache:
+    """Словарь, записи которого устаревают через ttl секунд.
+
+    Потокобезопасен: пишет цикл опроса, читают потоки обработки команд.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Количество записей, включая устаревшие."""
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Значение по ключу, если оно ещё не устарело."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        """Сохраняю значение на ttl секунд."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def update(self, key, function, default=None):
+        """Атомарно заменяю значение на function(старое значение)."""
+        with self._lock:
+            item = self._data.get(key)
+            value = default
+            if item is not None and item[0] > time.monotonic():
+                value = item[1]
+            value = function(value)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    def prune(self):
+        """Удаляю устаревшие записи."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [
+                key for key, (expires, _) in self._data.items()
+                if expires <= now
+            ]:
+                del self._data[key]
@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+from diff import StatusChange
+from exceptions import WrongHomeworkStatus
+from homework import HOMEWORK_VERDICTS, parse_status
+
+NOTIFY_HOLD = float(os.getenv('NOTIFY_HOLD', 0))
+
+
+def render(changes):
+    """Одно сообщение по всем изменениям чата.
+
+    Возвращаю текст (или None) и список ошибок по изменениям, которые
+    не удалось описать.
+    """
+    lines, errors = [], []
+    for change in changes:
+        try:
+            lines.append(parse_status(change.homework.as_dict()))
+        except (KeyError, WrongHomeworkStatus) as error:
+            errors.append(error)
+    if len(lines) < 2:
+        return (lines[0] if lines else None), errors
+    lines = [
+        f'— "{change.homework.name}": {HOMEWORK_VERDICTS[change.new_status]}'
+        for change in changes if change.new_status in HOMEWORK_VERDICTS
+    ]
+    return 'Изменились статусы проверки работ:\n' + '\n'.join(lines), errors
+
+
+class Coalescer:
+    """Собирает изменения статусов одного чата в одно уведомление.
+
+    Изменения копятся hold секунд с первого из них; при hold = 0
+    уведомление уходит в конце цикла опроса. Несколько переходов одной
+    работы сводятся к одному, от первого старого статуса к последнему.
+    Вместе с изменениями копятся id их сохранённых уведомлений, которые
+    общее уведомление заменяет.
+    """
+
+    def __init__(self, flush, hold=NOTIFY_HOLD):
+        self.flush = flush
+        self.hold = hold
+        self._held = {}
+
+    def __len__(self):
+        """Чатов с отложенными изменениями."""
+        return len(self._held)
+
+    def add(self, job, changes, staged=None):
+        """Добавляю изменения задачи, выпускаю их по окончании окна."""
+        held = self._held.get(job.chat_id)
+        if held is None:
+            held = self._held[job.chat_id] = (job, {}, [])
+            if self.hold > 0:
+                asyncio.get_running_loop().call_later(
+                    self.hold, self.release, job.chat_id
+                )
+        merged = held[1]
+        for change in changes:
+            key = change.homework.key
+            previous = merged.pop(key, None)
+            if previous is not None:
+                change = StatusChange(
+                    change.homework, previous.old_status, change.new_status
+                )
+            merged[key] = change
+        if staged is not None:
+            held[2].append(staged)
+        if self.hold <= 0:
+            self.release(job.chat_id)
+
+    def release(self, chat_id):
+        """Отдаю накопленные изменения чата в flush(job, changes, staged)."""
+        held = self._held.pop(chat_id, None)
+        if held is None:
+            return
+        job, merged, staged = held
+        changes = [
+            change for change in merged.values()
+            if change.old_status != change.new_status
+        ]
+        if changes or staged:
+            self.flush(job, changes, staged)
+
+    def release_all(self):
+        """Отдаю все накопленные изменения, например при остановке."""
+        for chat_id in list(self._held):
+            self.release(chat_id)
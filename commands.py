@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from collections import deque
+
+from cache import TTLCache
+from homework import HOMEWORK_VERDICTS, logger
+from scheduler import POLL_MAX_INTERVAL
+
+BOT_COMMANDS = os.getenv('BOT_COMMANDS', '').lower() in ('1', 'true', 'yes')
+BOT_WEBHOOK_URL = os.getenv('BOT_WEBHOOK_URL')
+BOT_WEBHOOK_PORT = int(os.getenv('PORT', 8443))
+STATUS_CACHE_TTL = float(os.getenv('STATUS_CACHE_TTL', POLL_MAX_INTERVAL * 2))
+HISTORY_SIZE = int(os.getenv('HISTORY_SIZE', 10))
+MESSAGE_LIMIT = 4096
+
+NO_DATA = 'Свежих данных о ваших работах пока нет, попробуйте позже.'
+NO_HISTORY = 'Изменений статусов пока не было.'
+
+
+def verdict(homework):
+    """Вердикт по статусу работы для ответа на команду."""
+    return HOMEWORK_VERDICTS.get(homework.status, 'Статус неизвестен.')
+
+
+class StatusCache:
+    """Последние ответы API и изменения статусов по чатам.
+
+    Команды бота отвечают только отсюда и не делают запросов к API.
+    """
+
+    def __init__(self, ttl=STATUS_CACHE_TTL, history_size=HISTORY_SIZE):
+        self.homeworks = TTLCache(ttl)
+        self.history = TTLCache(ttl)
+        self.history_size = history_size
+
+    def update(self, chat_id, homeworks):
+        """Добавляю работы из ответа API к известным для чата."""
+        def merge(known):
+            known = dict(known)
+            for homework in homeworks:
+                known[homework.key] = homework
+            return known
+
+        self.homeworks.update(str(chat_id), merge, {})
+
+    def record(self, chat_id, change):
+        """Запоминаю изменение статуса для /history."""
+        def append(history):
+            history.append((time.time(), change))
+            return history
+
+        self.history.update(
+            str(chat_id), append, deque(maxlen=self.history_size)
+        )
+
+    def status_text(self, chat_id):
+        """Текст ответа на /status."""
+        homeworks = self.homeworks.get(str(chat_id))
+        if not homeworks:
+            return NO_DATA
+        return '\n'.join(
+            f'"{homework.name}": {verdict(homework)}'
+            for homework in homeworks.values()
+        )
+
+    def history_text(self, chat_id):
+        """Текст ответа на /history, от новых изменений к старым."""
+        history = self.history.get(str(chat_id))
+        if not history:
+            return NO_HISTORY
+        return '\n'.join(
+            f'{time.strftime("%d.%m %H:%M", time.localtime(moment))} '
+            f'"{change.homework.name}": '
+            f'{change.old_status or "—"} → {change.new_status}'
+            for moment, change in reversed(history)
+        )
+
+
+def split_text(text, limit=MESSAGE_LIMIT):
+    """Делю длинный текст по строкам на сообщения не длиннее limit."""
+    parts, current = [], ''
+    for line in text.split('\n'):
+        if current and len(current) + len(line) + 1 > limit:
+            parts.append(current)
+            current = ''
+        current = f'{current}\n{line}' if current else line[:limit]
+    return parts + [current]
+
+
+class CommandServer:
+    """Обработка команд /status, /history и /stats рядом с циклом опроса.
+
+    Обновления Телеграма принимает Updater в своих потоках: через вебхук,
+    если задан BOT_WEBHOOK_URL, иначе длинным опросом. Команда /stats
+    доступна, если передан отчёт stats о сроках проверки.
+    """
+
+    def __init__(self, bot, cache, webhook_url=BOT_WEBHOOK_URL,
+                 port=BOT_WEBHOOK_PORT, stats=None):
+        self.bot = bot
+        self.cache = cache
+        self.stats = stats
+        self.webhook_url = webhook_url
+        self.port = port
+        self.updater = None
+
+    def start(self):
+        """Запускаю приём обновлений."""
+        from telegram.ext import CommandHandler, Updater
+
+        self.updater = Updater(bot=self.bot, use_context=True)
+        dispatcher = self.updater.dispatcher
+        dispatcher.add_handler(CommandHandler('status', self.status))
+        dispatcher.add_handler(CommandHandler('history', self.history))
+        if self.stats is not None:
+            dispatcher.add_handler(CommandHandler('stats', self.review_stats))
+            # Первое чтение истории долгое: делаю его заранее.
+            threading.Thread(target=self.stats.report, daemon=True).start()
+        if self.webhook_url:
+            self.updater.start_webhook(
+                listen='0.0.0.0', port=self.port,
+                url_path=self.bot.token, drop_pending_updates=True,
+                webhook_url=f'{self.webhook_url.rstrip("/")}/{self.bot.token}'
+            )
+        else:
+            self.updater.start_polling(drop_pending_updates=True)
+        logger.info('Обработка команд бота запущена')
+
+    def stop(self):
+        """Останавливаю приём обновлений."""
+        if self.updater is not None:
+            self.updater.stop()
+
+    def status(self, update, context):
+        """Команда /status."""
+        update.effective_message.reply_text(
+            self.cache.status_text(update.effective_chat.id)
+        )
+
+    def history(self, update, context):
+        """Команда /history."""
+        update.effective_message.reply_text(
+            self.cache.history_text(update.effective_chat.id)
+        )
+
+    def review_stats(self, update, context):
+        """Команда /stats."""
+        for text in split_text(self.stats.report()):
+            update.effective_message.reply_text(text)
@@ -0,0 +1,28 @@
+from collections import namedtuple
+
+StatusChange = namedtuple(
+    'StatusChange', ['homework', 'old_status', 'new_status']
+)
+
+
+class HomeworkDiff:
+    """Последние известные статусы работ одного студента."""
+
+    def __init__(self, statuses=None):
+        self.statuses = dict(statuses or {})
+
+    def apply(self, homeworks):
+        """Обновляю статусы по записям Homework.
+
+        Возвращаю изменения от старых к новым.
+        """
+        changes = []
+        for homework in reversed(homeworks):
+            key = homework.key
+            status = homework.status
+            old_status = self.statuses.get(key)
+            if key in self.statuses and old_status == status:
+                continue
+            self.statuses[key] = status
+            changes.append(StatusChange(homework, old_status, status))
+        return changes
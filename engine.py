@@ -0,0 +1,674 @@
+import asyncio
+import calendar
+import functools
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import aiohttp
+
+import logconfig
+import metrics
+from alerts import Alerts
+from breaker import CircuitBreaker
+from coalesce import NOTIFY_HOLD, Coalescer, render
+from diff import HomeworkDiff
+from exceptions import ApiAnswerError, ApiTimeoutError, ApiUnavailableError
+from history import HISTORY_COMPACT_INTERVAL
+from homework import (API_CONNECT_TIMEOUT, API_READ_TIMEOUT, ENDPOINT,
+                      ONE_MONTH_IN_SEC, logger, process_started_at)
+from outbox import OUTBOX_RETRY_INTERVAL, Outbox, Pending, retry_delay
+from ratelimit import ApiLimiter
+from retry import (API_HEDGE, API_HEDGE_PERCENTILE, LatencyTracker, hedged,
+                   with_retries)
+from scheduler import Scheduler
+from sender import TelegramSender
+from singleflight import SingleFlight
+from storage import STATE_FLUSH_INTERVAL
+from validation import Homework, loads, validate_response
+
+MAX_CONCURRENT_POLLS = int(os.getenv('MAX_CONCURRENT_POLLS', 100))
+LEASE_RENEW_INTERVAL = float(os.getenv('LEASE_RENEW_INTERVAL', 10))
+API_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+CURSOR_OVERLAP = int(os.getenv('CURSOR_OVERLAP', 60))
+RESYNC_INTERVAL = int(os.getenv('RESYNC_INTERVAL', 3600 * 24))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))
+HTTP_KEEPALIVE = float(os.getenv('HTTP_KEEPALIVE', 75))
+DNS_CACHE_TTL = 300
+RETRYABLE_ERRORS = (ApiTimeoutError, ApiUnavailableError)
+OUTAGE_MESSAGE = (
+    'API Практикума недоступно. Проверка статусов продолжится, '
+    'когда сервис восстановится.'
+)
+
+
+class PollJob:
+    """Состояние опроса API для одной пары токен/чат."""
+
+    def __init__(self, tenant_id, token, chat_id):
+        self.tenant_id = tenant_id
+        self.token = token
+        self.chat_id = chat_id
+        self.cursor = None
+        self.synced_at = None
+        self.diff = HomeworkDiff()
+        self.previos_message = ''
+        self.pending = []
+        self.loaded = False
+        self.validators = {}
+        self.errors = 0
+        self.outage = False
+        self.requested = False
+        self.alerts = Alerts()
+        self.changed_at = time.time()
+
+    @property
+    def reviewing(self):
+        """Есть ли у студента работа на ревью."""
+        return 'reviewing' in self.diff.statuses.values()
+
+    def window_start(self, now):
+        """Начало окна запроса: курсор или месяц при пересинхронизации."""
+        if self.resync_due(now):
+            return now - ONE_MONTH_IN_SEC
+        return self.cursor
+
+    def resync_due(self, now):
+        """Пора ли запросить полное окно в месяц."""
+        return self.cursor is None or now - self.synced_at >= RESYNC_INTERVAL
+
+    def advance(self, current_date, resynced, now, changed=True):
+        """Сдвигаю курсор к current_date из ответа с запасом перекрытия.
+
+        Пока обновлений нет, курсор стоит на месте: запрос остаётся тем же
+        и сервер может ответить 304 на условный запрос.
+        """
+        if isinstance(current_date, int) and (changed or resynced):
+            self.cursor = max(current_date - CURSOR_OVERLAP, 0)
+        if resynced:
+            self.synced_at = now
+
+
+def parse_api_date(value):
+    """Время из даты API в секундах эпохи или None, если не разобрать."""
+    try:
+        return calendar.timegm(time.strptime(value, API_DATE_FORMAT))
+    except (TypeError, ValueError):
+        return None
+
+
+def status_changed_at(homework):
+    """Момент смены статуса по date_updated, иначе текущее время."""
+    changed_at = parse_api_date(homework.date)
+    return time.time() if changed_at is None else changed_at
+
+
+def make_session():
+    """Сессия с общим пулом keep-alive соединений к API."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE, keepalive_timeout=HTTP_KEEPALIVE,
+        ttl_dns_cache=DNS_CACHE_TTL
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=API_CONNECT_TIMEOUT + API_READ_TIMEOUT,
+        sock_connect=API_CONNECT_TIMEOUT, sock_read=API_READ_TIMEOUT
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def conditional_headers(validators, timestamp):
+    """Заголовки условного запроса, если запрос повторяет предыдущий."""
+    if validators.get('from_date') != timestamp:
+        return {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+async def fetch_api_answer(session, token, timestamp, validators=None,
+                           endpoint=ENDPOINT):
+    """Асинхронно отправляю запрос API от имени токена.
+
+    Если передан словарь validators, запрос делается условным, а в словарь
+    записываются ETag и Last-Modified ответа. На ответ 304 возвращаю None.
+    """
+    timestamp = int(timestamp)
+    params = {'from_date': timestamp}
+    headers = {'Authorization': f'OAuth {token}'}
+    if validators is not None:
+        headers.update(conditional_headers(validators, timestamp))
+    try:
+        async with session.get(
+            endpoint, headers=headers, params=params
+        ) as response:
+            if response.status == HTTPStatus.NOT_MODIFIED:
+                logger.debug('Ответ сервера не изменился')
+                return None
+            if response.status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                raise ApiUnavailableError(
+                    f'API недоступно: ответ {response.status}.'
+                )
+            if response.status != HTTPStatus.OK:
+                raise ApiAnswerError('Ошибка при запросе к основному API.')
+            answer = loads(await response.read())
+    except asyncio.TimeoutError:
+        raise ApiTimeoutError('API не ответило за отведённое время.')
+    except aiohttp.ClientError as error:
+        raise ApiUnavailableError(
+            f'Ошибка при запросе к основному API: {error}'
+        )
+    except ValueError as error:
+        raise ApiAnswerError(f'Ошибка при запросе к основному API: {error}')
+    if validators is not None:
+        validators.clear()
+        validators.update(
+            from_date=timestamp, etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+    logger.debug('Получен ответ от сервера')
+    return answer
+
+
+class Engine:
+    """Опрашивает API для множества задач в одном цикле событий."""
+
+    def __init__(self, bot, jobs, scheduler=None, store=None, sender=None,
+                 status_cache=None, max_concurrent=MAX_CONCURRENT_POLLS,
+                 endpoint=ENDPOINT, metrics_port=metrics.METRICS_PORT,
+                 leases=None, breaker=None, api_limiter=None, history=None,
+                 notify_hold=NOTIFY_HOLD, flights=None):
+        self.sender = sender or TelegramSender(bot)
+        self.api_limiter = ApiLimiter() if api_limiter is None else api_limiter
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.flights = SingleFlight() if flights is None else flights
+        self.latencies = LatencyTracker()
+        self.leases = leases
+        self.status_cache = status_cache
+        self.metrics_port = metrics_port
+        self.endpoint = endpoint
+        self.jobs = list(jobs)
+        self.scheduler = Scheduler() if scheduler is None else scheduler
+        self.store = store
+        self.history = history
+        self.max_concurrent = max_concurrent
+        self.session = None
+        self._db_executor = ThreadPoolExecutor(1)
+        self._tasks = set()
+        self._poll_ids = itertools.count(1)
+        self._first_poll = True
+        self.outbox = Outbox(self.flush_state)
+        self.coalescer = Coalescer(self.notify, notify_hold)
+        self._pending_jobs = set()
+
+    async def run(self):
+        """Запускаю опрос всех задач до отмены."""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.sender.start()
+        self.scheduler.spread(self.jobs)
+        metrics.SEND_QUEUE_DEPTH.set_function(self.sender.queue.qsize)
+        metrics.SCHEDULED_JOBS.set_function(self.scheduler.__len__)
+        metrics.API_BREAKER_OPEN.set_function(
+            lambda: int(self.breaker.is_open)
+        )
+        metrics_server = None
+        if self.metrics_port:
+            metrics_server = await metrics.start_server(self.metrics_port)
+        background = [
+            asyncio.ensure_future(self._flush_forever()),
+            asyncio.ensure_future(self._retry_forever()),
+        ]
+        if self.history is not None:
+            background.append(asyncio.ensure_future(self._compact_forever()))
+        if self.leases is not None:
+            await self.refresh_leases()
+            background.append(asyncio.ensure_future(self._lease_forever()))
+        try:
+            async with make_session() as session:
+                self.session = session
+                while True:
+                    job = await self.scheduler.next_due()
+                    metrics.SCHEDULER_LAG.set(self.scheduler.lag)
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(self._dispatch(job))
+                    task.add_done_callback(lambda _: semaphore.release())
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            for task in background:
+                task.cancel()
+            self.coalescer.release_all()
+            await self.outbox.drain()
+            await self.flush_state()
+            await self.release_leases()
+            await self.sender.stop()
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(STATE_FLUSH_INTERVAL)
+            try:
+                await self.flush_state()
+            except Exception as error:
+                logger.error(f'Не удалось сохранить состояние: {error}')
+
+    async def _retry_forever(self):
+        while True:
+            await asyncio.sleep(OUTBOX_RETRY_INTERVAL)
+            for job in list(self._pending_jobs):
+                if not job.pending:
+                    self._pending_jobs.discard(job)
+                elif self.owns(job):
+                    self.retry_pending(job)
+
+    async def _compact_forever(self):
+        while True:
+            await asyncio.sleep(HISTORY_COMPACT_INTERVAL)
+            try:
+                removed = await asyncio.get_running_loop().run_in_executor(
+                    self._db_executor, self.history.compact
+                )
+            except Exception as error:
+                logger.error(f'Не удалось сжать историю статусов: {error}')
+            else:
+                logger.info(f'История статусов сжата, удалено: {removed}')
+
+    async def _lease_forever(self):
+        while True:
+            await asyncio.sleep(LEASE_RENEW_INTERVAL)
+            try:
+                await self.refresh_leases()
+            except Exception as error:
+                logger.error(f'Не удалось продлить аренды: {error}')
+
+    async def refresh_leases(self):
+        """Продлеваю аренды корзин студентов.
+
+        Перед продлением записываю состояние, чтобы отпущенных студентов
+        новый владелец продолжил с последнего курсора. Состояние полученных
+        студентов перечитывается при их следующем опросе.
+        """
+        await self.flush_state()
+        gained = await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, self.leases.refresh
+        )
+        for job in self.jobs:
+            if self.leases.bucket_for(job.tenant_id) in gained:
+                job.loaded = False
+
+    async def release_leases(self):
+        """Отпускаю аренды, чтобы другие узлы сразу забрали студентов."""
+        if self.leases is None:
+            return
+        await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, self.leases.release_all
+        )
+
+    def owns(self, job):
+        """Опрашивает ли этот узел задачу."""
+        return self.leases is None or self.leases.owns(job.tenant_id)
+
+    async def flush_state(self):
+        """Записываю накопленное состояние одной транзакцией."""
+        loop = asyncio.get_running_loop()
+        if self.store is not None:
+            batch = self.store.take_batch()
+            try:
+                await loop.run_in_executor(
+                    self._db_executor, self.store.write, batch
+                )
+            except Exception:
+                # Пачка, в том числе исходящие, запишется следующей попыткой.
+                self.store.restore(batch)
+                raise
+        if self.history is not None:
+            batch = self.history.take_batch()
+            try:
+                await loop.run_in_executor(
+                    self._db_executor, self.history.write, batch
+                )
+            except Exception:
+                self.history.restore(batch)
+                raise
+
+    async def load_state(self, job):
+        """Восстанавливаю состояние задачи при первом её опросе."""
+        if self.store is None:
+            job.loaded = True
+            return
+        state = await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, self.store.load, job.tenant_id
+        )
+        job.cursor, job.synced_at = state.cursor, state.synced_at
+        job.previos_message = state.previos_message
+        if state.changed_at is not None:
+            job.changed_at = state.changed_at
+        if job.previos_message:
+            job.alerts.mark(job.previos_message)
+        job.diff = HomeworkDiff(state.statuses)
+        job.pending = [Pending(id, text, 0, 0) for id, text in state.pending]
+        if job.pending:
+            self._pending_jobs.add(job)
+        self.cache_homeworks(job, [
+            Homework(key, state.names[key], status)
+            for key, status in state.statuses.items()
+        ])
+        job.loaded = True
+
+    async def try_load_state(self, job):
+        """Загружаю состояние задачи, при ошибке сообщаю о ней в лог.
+
+        Опрос без сохранённого состояния принял бы студента за нового,
+        поэтому после ошибки он пропускается, а загрузка повторится при
+        следующем.
+        """
+        try:
+            await self.load_state(job)
+        except Exception as error:
+            logger.error(f'Не удалось загрузить состояние: {error}')
+            metrics.ERRORS.inc(type=metrics.error_type(error))
+            return False
+        return True
+
+    def cache_homeworks(self, job, homeworks):
+        """Обновляю кэш, из которого отвечают команды бота."""
+        if self.status_cache is not None:
+            self.status_cache.update(job.chat_id, homeworks)
+
+    def save_state(self, job, changes=()):
+        """Передаю изменения задачи в хранилище и журнал статусов."""
+        if changes:
+            job.changed_at = time.time()
+        if self.history is not None:
+            observed_at = time.time()
+            for change in changes:
+                self.history.append(
+                    job.tenant_id, change.homework,
+                    parse_api_date(change.homework.date), observed_at
+                )
+        if self.store is None:
+            return
+        self.store.save_cursor(
+            job.tenant_id, job.cursor, job.synced_at, job.previos_message,
+            job.changed_at
+        )
+        for change in changes:
+            self.store.save_status(
+                job.tenant_id, change.homework.key, change.new_status,
+                change.homework.name
+            )
+
+    async def _dispatch(self, job):
+        logconfig.bind(tenant=job.tenant_id, poll=next(self._poll_ids))
+        if self._first_poll:
+            self._first_poll = False
+            self.report_startup()
+        try:
+            if self.owns(job):
+                await self.poll(job)
+        finally:
+            self.scheduler.reschedule(job)
+
+    def report_startup(self):
+        """Логирую время от запуска процесса до первого опроса."""
+        seconds = time.time() - process_started_at()
+        metrics.STARTUP_SECONDS.set(round(seconds, 3))
+        logger.info(f'От запуска процесса до первого опроса: {seconds:.2f} с')
+
+    async def poll(self, job):
+        """Один цикл опроса: запрос, проверка и уведомление."""
+        if not job.loaded and not await self.try_load_state(job):
+            return
+        self.retry_pending(job)
+        self.send_digest(job)
+        if not self.breaker.allow():
+            self.report_outage(job)
+            return
+        probe = self.breaker.is_open
+        now = int(time.time())
+        resync = job.resync_due(now)
+        try:
+            response = await self.fetch(job, job.window_start(now), probe)
+            job.errors, job.outage = 0, False
+            if response is None:
+                self.cache_homeworks(job, [])
+                logger.debug('Обновлений не обнаружено')
+                return
+            homeworks, current_date = validate_response(response)
+            self.cache_homeworks(job, homeworks)
+            first_poll = job.cursor is None
+            job.advance(current_date, resync, now, bool(homeworks))
+            changes = job.diff.apply(homeworks)
+        except ApiAnswerError as error:
+            job.errors += 1
+            if self.breaker.is_open and isinstance(error, RETRYABLE_ERRORS):
+                metrics.ERRORS.inc(type=metrics.error_type(error))
+                self.report_outage(job)
+            else:
+                self.report_error(job, error)
+            return
+        except Exception as error:
+            self.report_error(job, error)
+            return
+        self.save_state(job, changes)
+        if not changes or first_poll:
+            logger.debug('Обновлений не обнаружено')
+            return
+        self.record_changes(job, changes)
+
+    def record_changes(self, job, changes):
+        """Учитываю изменения статусов и передаю их на уведомление."""
+        logger.debug('Статус работы изменился')
+        for change in changes:
+            metrics.TRANSITIONS.inc(
+                old=change.old_status or 'none', new=change.new_status
+            )
+            if self.status_cache is not None:
+                self.status_cache.record(job.chat_id, change)
+        staged = None
+        if self.coalescer.hold > 0 and self.store is not None:
+            # Статусы уже сохранены: пока изменения ждут окна, их
+            # уведомление лежит в исходящих и не теряется при падении.
+            message, _ = render(changes)
+            if message is not None:
+                staged = self.store.add_pending(job.tenant_id, message)
+        self.coalescer.add(job, changes, staged)
+
+    async def fetch(self, job, timestamp, probe=False, cached=False):
+        """Запрос к API, общий для одновременных опросов того же окна.
+
+        Плановый опрос не берёт ответ из кэша: курсор стоит на месте, пока
+        изменений нет, и кэш по (токен, from_date) скрыл бы новые статусы.
+        Из кэша (cached=True) могут отвечать только другие вызовы. Если
+        опрос пропущен размыкателем как пробный, а ответ пришёл из кэша
+        или от чужого запроса, место пробы освобождается.
+        """
+        metrics.POLLS.inc()
+        job.requested = False
+        try:
+            return await self.flights.do(
+                (job.token, int(timestamp)), self.request, job, timestamp,
+                cached=cached
+            )
+        finally:
+            if probe and not job.requested:
+                self.breaker.release()
+
+    async def request(self, job, timestamp):
+        """Запрос к API с повторами, исход учитывает размыкатель.
+
+        Время ожидания лимита не считается временем ответа API.
+        """
+        job.requested = True
+        waits = []
+        started = time.monotonic()
+        try:
+            response = await with_retries(
+                lambda: self.attempt(job, timestamp, waits), RETRYABLE_ERRORS
+            )
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as error:
+            # Неудача для размыкателя — только недоступность API: неверный
+            # токен или ответ не мешают остальным студентам.
+            self.breaker.record(
+                not isinstance(error, RETRYABLE_ERRORS),
+                time.monotonic() - started - sum(waits)
+            )
+            raise
+        self.breaker.record(True, time.monotonic() - started - sum(waits))
+        return response
+
+    async def limit(self, job):
+        """Жду разрешения лимита на один запрос и возвращаю время ожидания.
+
+        Когда лимит исчерпан, студенты с работой на ревью получают
+        разрешение первыми.
+        """
+        waited = await self.api_limiter.acquire(
+            job.token, priority=0 if job.reviewing else 1
+        )
+        metrics.API_QUEUE_WAIT.observe(waited)
+        return waited
+
+    async def attempt(self, job, timestamp, waits):
+        """Одна попытка запроса, при API_HEDGE — с подстраховкой.
+
+        Попытка и подстраховка берут по токену лимита. Ожидание попытки
+        добавляется в waits.
+        """
+        waits.append(await self.limit(job))
+        delay = None
+        if API_HEDGE:
+            delay = self.latencies.percentile(API_HEDGE_PERCENTILE)
+        return await hedged(
+            lambda: self.send_request(job, timestamp), delay,
+            hedge=lambda: self.hedge_request(job, timestamp)
+        )
+
+    async def hedge_request(self, job, timestamp):
+        """Подстраховочный запрос в пределах лимита."""
+        await self.limit(job)
+        return await self.send_request(job, timestamp)
+
+    async def send_request(self, job, timestamp):
+        """HTTP-запрос к API с учётом времени ответа."""
+        started = time.monotonic()
+        try:
+            response = await fetch_api_answer(
+                self.session, job.token, timestamp, job.validators,
+                self.endpoint
+            )
+        finally:
+            duration = time.monotonic() - started
+            metrics.API_LATENCY.observe(duration)
+        self.latencies.observe(duration)
+        return response
+
+    def notify(self, job, changes, staged=()):
+        """Ставлю в очередь одно уведомление по изменениям статусов.
+
+        Сохранённые на время окна уведомления staged заменяются им в той
+        же записи исходящих.
+        """
+        message, errors = render(changes)
+        for error in errors:
+            self.report_error(job, error)
+        if message is not None:
+            self.deliver(job, message, changed_at=min(
+                status_changed_at(change.homework) for change in changes
+            ))
+        for pending_id in staged:
+            self.store.remove_pending(pending_id)
+
+    def deliver(self, job, message, pending=None, keep=True,
+                changed_at=None):
+        """Ставлю сообщение студенту в очередь отправки.
+
+        Если keep истинно, новое сообщение сначала записывается в исходящие
+        хранилища и уходит в очередь только после записи на диск, а
+        снимается оттуда после ответа Телеграма. Недоставленное сообщение
+        остаётся в job.pending и повторяется с растущей паузой.
+        """
+        staged = False
+        if keep and pending is None:
+            pending = Pending(None, message, 0, 0)
+            if self.store is not None:
+                pending = pending._replace(
+                    id=self.store.add_pending(job.tenant_id, message)
+                )
+                staged = True
+
+        done = functools.partial(self.sent, job, pending, changed_at)
+
+        def submit():
+            if not self.sender.submit(job.chat_id, message, done):
+                done(False)
+
+        if staged:
+            self.outbox.stage(submit)
+        else:
+            submit()
+
+    def sent(self, job, pending, changed_at, delivered):
+        """Итог отправки: снимаю сообщение из исходящих или откладываю."""
+        if delivered and changed_at is not None:
+            metrics.NOTIFICATION_LAG.observe(time.time() - changed_at)
+        if pending is None:
+            return
+        if not delivered:
+            self.postpone(job, pending)
+        elif self.store is not None and pending.id is not None:
+            self.store.remove_pending(pending.id)
+
+    def postpone(self, job, pending):
+        """Откладываю недоставленное сообщение до следующей попытки."""
+        attempts = pending.attempts + 1
+        job.pending.append(pending._replace(
+            attempts=attempts, retry_at=time.time() + retry_delay(attempts)
+        ))
+        self._pending_jobs.add(job)
+
+    def retry_pending(self, job, now=None):
+        """Повторяю неотправленные уведомления, чья пауза истекла."""
+        now = time.time() if now is None else now
+        due = [pending for pending in job.pending if pending.retry_at <= now]
+        job.pending = [
+            pending for pending in job.pending if pending.retry_at > now
+        ]
+        for pending in due:
+            self.deliver(job, pending.text, pending)
+
+    def report_outage(self, job):
+        """Одно сообщение о недоступности API на студента за сбой."""
+        if job.outage:
+            return
+        job.outage = True
+        self.deliver(job, OUTAGE_MESSAGE, keep=False)
+
+    def send_digest(self, job):
+        """Отправляю сводку подавленных ошибок, если пришло её время."""
+        digest = job.alerts.digest()
+        if digest is not None:
+            self.deliver(job, digest, keep=False)
+
+    def report_error(self, job, error):
+        """Логирую ошибку и сообщаю о ней, если она не повтор.
+
+        Повтор определяется по отпечатку ошибки в окне ALERT_WINDOW,
+        подавленные повторы попадают в периодическую сводку.
+        """
+        message = f'Сбой в работе программы: {error}'
+        logger.error(message)
+        metrics.ERRORS.inc(type=metrics.error_type(error))
+        if not job.alerts.should_send(message):
+            return
+        job.previos_message = message
+        self.save_state(job)
+        self.deliver(job, message, keep=False)
@@ -14,3 +14,34 @@ class MessageNotSent(Exception):
     """Исключение для неотправленного сообщения."""
 
     pass
+
+
+class ResponseKeyError(KeyError):
+    """Исключение для отсутствующего поля в ответе сервера."""
+
+    def __init__(self, field):
+        self.field = field
+        super().__init__(f'В ответе сервера отсутствует поле {field}.')
+
+
+class ResponseTypeError(TypeError):
+    """Исключение для поля ответа сервера с неверным типом."""
+
+    def __init__(self, field, expected, value):
+        self.field = field
+        super().__init__(
+            f'Поле {field} в ответе сервера имеет тип '
+            f'{type(value).__name__}, ожидался {expected}.'
+        )
+
+
+class ApiTimeoutError(ApiAnswerError):
+    """Исключение для запроса к API, не уложившегося в срок."""
+
+    pass
+
+
+class ApiUnavailableError(ApiAnswerError):
+    """Исключение для временной недоступности API: сеть или ответ 5xx."""
+
+    pass
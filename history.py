@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+HISTORY_DB = os.getenv('HISTORY_DB', 'history.sqlite3')
+HISTORY_RETENTION_DAYS = float(os.getenv('HISTORY_RETENTION_DAYS', 365))
+HISTORY_COMPACT_INTERVAL = float(
+    os.getenv('HISTORY_COMPACT_INTERVAL', 3600 * 6)
+)
+DAY_IN_SEC = 60 * 60 * 24
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    homework_key NOT NULL,
+    homework_name TEXT,
+    status TEXT NOT NULL,
+    changed_at INTEGER,
+    observed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_tenant
+    ON transitions (tenant_id, observed_at);
+CREATE INDEX IF NOT EXISTS transitions_homework
+    ON transitions (homework_key, tenant_id, id);
+'''
+
+Transition = namedtuple(
+    'Transition',
+    ['tenant_id', 'homework_key', 'homework_name', 'status', 'changed_at',
+     'observed_at']
+)
+
+COLUMNS = ', '.join(Transition._fields)
+
+
+class History:
+    """Журнал смен статусов работ в SQLite, только на дополнение.
+
+    Записи копятся в памяти и пишутся пачкой вместе с состоянием опроса.
+    Старше retention_days записи удаляются при сжатии, как и повторы
+    статуса, который у работы уже был записан последним.
+    """
+
+    def __init__(self, path=HISTORY_DB,
+                 retention_days=HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._connection = None
+        self._added = []
+
+    @property
+    def connection(self):
+        """Соединение открывается при первом обращении."""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            # Освобождённые при сжатии страницы возвращаются на диск,
+            # действует только для новой базы.
+            connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def __len__(self):
+        """Записей, ждущих записи на диск."""
+        return len(self._added)
+
+    def append(self, tenant_id, homework, changed_at=None, observed_at=None):
+        """Запоминаю новый статус работы до следующей записи пачки."""
+        observed_at = time.time() if observed_at is None else observed_at
+        self._added.append(Transition(
+            tenant_id, homework.key, homework.name, homework.status,
+            changed_at, observed_at
+        ))
+
+    def take_batch(self):
+        """Забираю накопленные записи."""
+        added, self._added = self._added, []
+        return added
+
+    def restore(self, batch):
+        """Возвращаю незаписанные записи в начало накопленных."""
+        self._added[:0] = batch
+
+    def write(self, batch):
+        """Дописываю пачку записей одной транзакцией."""
+        if not batch:
+            return
+        connection = self.connection
+        connection.execute('BEGIN')
+        try:
+            connection.executemany(
+                f'INSERT INTO transitions ({COLUMNS}) '
+                'VALUES (?, ?, ?, ?, ?, ?)', batch
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def flush(self):
+        """Записываю всё накопленное, при ошибке оставляю его на потом."""
+        batch = self.take_batch()
+        try:
+            self.write(batch)
+        except Exception:
+            self.restore(batch)
+            raise
+
+    def for_tenant(self, tenant_id, since=None):
+        """История студента по времени наблюдения, начиная с since."""
+        return self._select(
+            'WHERE tenant_id = ? AND observed_at >= ? '
+            'ORDER BY observed_at, id', (tenant_id, since or 0)
+        )
+
+    def for_homework(self, homework_key, tenant_id=None):
+        """История одной работы, при tenant_id — только этого студента."""
+        if tenant_id is None:
+            return self._select(
+                'WHERE homework_key = ? ORDER BY id', (homework_key,)
+            )
+        return self._select(
+            'WHERE homework_key = ? AND tenant_id = ? ORDER BY id',
+            (homework_key, tenant_id)
+        )
+
+    def last_id(self):
+        """Наибольший id в журнале, 0 для пустого."""
+        return self.connection.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM transitions'
+        ).fetchone()[0]
+
+    def rows_between(self, after_id, last_id):
+        """Записи с id в (after_id, last_id] по порядку id.
+
+        Строка: студент, работа, название, статус и время смены (по API,
+        иначе время наблюдения).
+        """
+        return self.connection.execute(
+            "SELECT tenant_id, homework_key, COALESCE(homework_name, ''), "
+            'status, COALESCE(changed_at, observed_at) FROM transitions '
+            'WHERE id > ? AND id <= ? ORDER BY id', (after_id, last_id)
+        ).fetchall()
+
+    def _select(self, condition, params):
+        return [
+            Transition(*row) for row in self.connection.execute(
+                f'SELECT {COLUMNS} FROM transitions {condition}', params
+            )
+        ]
+
+    def compact(self, now=None):
+        """Удаляю устаревшие записи и повторы статусов.
+
+        Возвращаю число удалённых записей.
+        """
+        now = time.time() if now is None else now
+        connection = self.connection
+        connection.execute('BEGIN')
+        try:
+            expired = connection.execute(
+                'DELETE FROM transitions WHERE observed_at < ?',
+                (now - self.retention_days * DAY_IN_SEC,)
+            ).rowcount
+            repeated = connection.execute(
+                'DELETE FROM transitions WHERE status = ('
+                'SELECT previous.status FROM transitions AS previous '
+                'WHERE previous.homework_key = transitions.homework_key '
+                'AND previous.tenant_id = transitions.tenant_id '
+                'AND previous.id < transitions.id '
+                'ORDER BY previous.id DESC LIMIT 1)'
+            ).rowcount
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        if expired or repeated:
+            connection.execute('PRAGMA incremental_vacuum').fetchall()
+        return expired + repeated
+
+    def close(self):
+        """Закрываю соединение."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def make_history():
+    """Журнал по настройкам окружения или None, если он выключен."""
+    if not HISTORY_DB:
+        return None
+    return History(HISTORY_DB)
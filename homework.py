@@ -1,14 +1,18 @@
+import argparse
+import asyncio
 import logging
 import os
 import sys
+import threading
 import time
 from http import HTTPStatus
 
-import requests
-import telegram
 from dotenv import load_dotenv
 
-from exceptions import ApiAnswerError, MessageNotSent, WrongHomeworkStatus
+from exceptions import (ApiAnswerError, ApiTimeoutError, MessageNotSent,
+                        WrongHomeworkStatus)
+
+STARTED_AT = time.time()
 
 load_dotenv()
 
@@ -22,6 +26,10 @@ ONE_MONTH_IN_SEC = 3600 * 24 * 30
 LAST_HOMEWORK = 0
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', 3.05))
+API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', 10))
+API_RETRIES = int(os.getenv('API_RETRIES', 2))
+API_RETRY_BACKOFF = float(os.getenv('API_RETRY_BACKOFF', 0.5))
 
 
 HOMEWORK_VERDICTS = {
@@ -62,12 +70,10 @@ def get_api_answer(current_timestamp):
     PARAMS_FOR_REQUEST = {
         'url': ENDPOINT,
         'headers': HEADERS,
-        'params': params
+        'params': params,
+        'timeout': (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
     }
-    try:
-        response = requests.get(**PARAMS_FOR_REQUEST)
-    except Exception as error:
-        raise ApiAnswerError(f'Ошибка при запросе к основному API: {error}')
+    response = request_with_retries(PARAMS_FOR_REQUEST)
     if response.status_code != HTTPStatus.OK:
         raise ApiAnswerError('Ошибка при запросе к основному API.')
     logger.debug('Получен ответ от сервера')
@@ -75,11 +81,41 @@ def get_api_answer(current_timestamp):
     return response
 
 
+def request_with_retries(params, retries=API_RETRIES):
+    """GET к API с повторами при таймауте и обрыве соединения.
+
+    Перед повтором жду случайную паузу в растущем окне. Если все попытки
+    не уложились в срок, выбрасываю ApiTimeoutError.
+    """
+    import requests
+
+    # retry импортирует этот модуль, поэтому импорт отложен.
+    from retry import backoff_delay
+
+    for attempt in range(retries + 1):
+        try:
+            return requests.get(**params)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            if attempt == retries:
+                if isinstance(error, requests.Timeout):
+                    raise ApiTimeoutError(
+                        f'API не ответило за отведённое время: {error}'
+                    )
+                raise ApiAnswerError(
+                    f'Ошибка при запросе к основному API: {error}'
+                )
+        except Exception as error:
+            raise ApiAnswerError(
+                f'Ошибка при запросе к основному API: {error}'
+            )
+        time.sleep(backoff_delay(attempt, API_RETRY_BACKOFF))
+
+
 def check_response(response):
     """Проверяет ответ API на корректность."""
     if not isinstance(response, dict):
         raise TypeError('Ответ сервера имеет не верный тип данных.')
-    if ('homeworks' or 'current_date') not in response:
+    if 'homeworks' not in response or 'current_date' not in response:
         raise KeyError('В ответе сервера отсутствуют необходимые ключи.')
     homeworks = response['homeworks']
     if not isinstance(homeworks, list):
@@ -105,6 +141,48 @@ def check_tokens():
     return all([TELEGRAM_CHAT_ID, TELEGRAM_TOKEN, PRACTICUM_TOKEN])
 
 
+def process_started_at():
+    """Время запуска процесса; без /proc — время импорта модуля."""
+    try:
+        with open('/proc/self/stat') as stat:
+            ticks = int(stat.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as uptime:
+            booted_at = time.time() - float(uptime.read().split()[0])
+        return booted_at + ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return STARTED_AT
+
+
+class LazyBot:
+    """Бот Телеграма, который создаётся один раз при первом обращении.
+
+    Импорт python-telegram-bot занимает заметную часть запуска, поэтому
+    он откладывается до первой отправки, и первый опрос API его не ждёт.
+    """
+
+    def __init__(self, token, **kwargs):
+        self._token = token
+        self._kwargs = kwargs
+        self._bot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Настоящий telegram.Bot."""
+        if self._bot is None:
+            with self._lock:
+                if self._bot is None:
+                    import telegram
+
+                    self._bot = telegram.Bot(
+                        token=self._token, **self._kwargs
+                    )
+        return self._bot
+
+    def __getattr__(self, name):
+        """Остальные атрибуты берутся у настоящего бота."""
+        return getattr(self.get(), name)
+
+
 def log_and_send(bot, error, previos_message):
     """Логирую и отправляю сообщение, если оно уникально."""
     message = f'Сбой в работе программы: {error}'
@@ -115,63 +193,104 @@ def log_and_send(bot, error, previos_message):
     return previos_message
 
 
-def do_homework():
-    """Вспомогательная функция, иначе main is too complex (C901)."""
-    previos_message = ''
-    if not check_tokens():
-        logger.critical('Недоступна как минимум одна из переменных окружения')
-        sys.exit(1)
-    logger.debug('Переменные окружения доступны')
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
+def parse_args(args=None):
+    """Разбираю аргументы командной строки."""
+    from history import HISTORY_DB
+    from shards import WORKER_SHARDS
+
+    parser = argparse.ArgumentParser(
+        description='Бот для уведомлений о статусе домашних работ.'
+    )
+    parser.add_argument(
+        '--shards', type=int, default=WORKER_SHARDS,
+        help='число процессов, между которыми делятся студенты'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    stats = subparsers.add_parser(
+        'stats', help='сроки проверки работ по истории статусов'
+    )
+    stats.add_argument(
+        '--history-db', default=HISTORY_DB,
+        help='файл истории статусов'
+    )
+    return parser.parse_args(args)
+
+
+def print_stats(history_db):
+    """Печатаю отчёт о сроках проверки по истории статусов."""
+    from analytics import ReviewStats
+    from history import History
+
+    print(ReviewStats(History(history_db)).report())
+
+
+def run_worker(tenants):
+    """Опрос всех студентов в текущем процессе."""
+    from commands import BOT_COMMANDS, CommandServer, StatusCache
+    from engine import Engine, PollJob
+    from history import History, make_history
+    from leases import make_leases
+    from storage import STATE_DB, Store
+
+    bot = LazyBot(TELEGRAM_TOKEN)
+    history = make_history()
+    status_cache = commands = None
+    if BOT_COMMANDS:
+        status_cache = StatusCache()
+        stats = None
+        if history is not None:
+            # NumPy нужен только отчёту. Отчёт читает журнал через своё
+            # соединение, потому что работает в потоках команд.
+            from analytics import ReviewStats
+
+            stats = ReviewStats(History(history.path))
+        commands = CommandServer(bot.get(), status_cache, stats=stats)
+        commands.start()
+    engine = Engine(
+        bot, [PollJob(*tenant) for tenant in tenants], store=Store(STATE_DB),
+        status_cache=status_cache, leases=make_leases(), history=history
+    )
     try:
-        homework = check_response(get_api_answer(
-            current_timestamp - ONE_MONTH_IN_SEC
-        ))
-    except ApiAnswerError as error:
-        log_and_send(bot, error, previos_message)
-    except TypeError as error:
-        log_and_send(bot, error, previos_message)
-    except KeyError as error:
-        log_and_send(bot, error, previos_message)
-    except WrongHomeworkStatus as error:
-        log_and_send(bot, error, previos_message)
-    except Exception as error:
-        log_and_send(bot, error, previos_message)
-    return homework
+        asyncio.run(engine.run())
+    finally:
+        if commands is not None:
+            commands.stop()
 
 
-def main(homework):
+def main(args=None):
     """Основная логика работы бота."""
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    previos_message = ''
-    while True:
-        try:
-            if homework != check_response(
-                get_api_answer(current_timestamp - ONE_MONTH_IN_SEC)
-            ):
-                logger.debug('Статус работы изменился')
-                homework = check_response(get_api_answer(
-                    current_timestamp - ONE_MONTH_IN_SEC)
-                )
-                send_message(bot, parse_status(homework[LAST_HOMEWORK]))
-            logger.debug('Обновлений не обнаружено')
-        except MessageNotSent as error:
-            logger.error(error)
-        except ApiAnswerError as error:
-            previos_message = log_and_send(bot, error, previos_message)
-        except TypeError as error:
-            previos_message = log_and_send(bot, error, previos_message)
-        except KeyError as error:
-            previos_message = log_and_send(bot, error, previos_message)
-        except WrongHomeworkStatus as error:
-            previos_message = log_and_send(bot, error, previos_message)
-        except Exception as error:
-            previos_message = log_and_send(bot, error, previos_message)
-        finally:
-            time.sleep(RETRY_TIME)
+    # Движок импортирует функции этого модуля, поэтому импорт отложен.
+    from logconfig import setup_logging
+    from shards import Supervisor
+    from tenants import TENANTS_FILE, Tenant, load_tenants
+
+    args = parse_args(args)
+    if args.command == 'stats':
+        print_stats(args.history_db)
+        return
+    if TENANTS_FILE:
+        tokens_available = bool(TELEGRAM_TOKEN)
+    else:
+        tokens_available = check_tokens()
+    if not tokens_available:
+        logger.critical('Недоступна как минимум одна из переменных окружения')
+        sys.exit(1)
+    setup_logging(logger, formatter)
+    logger.debug('Переменные окружения доступны')
+    if TENANTS_FILE:
+        tenants = load_tenants(TENANTS_FILE)
+        logger.info(f'Загружено студентов из реестра: {len(tenants)}')
+    else:
+        tenants = [Tenant('default', PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+    if args.shards > 1:
+        logger.info(f'Студенты распределяются по {args.shards} процессам')
+        Supervisor(tenants, args.shards).run()
+    else:
+        run_worker(tenants)
 
 
 if __name__ == '__main__':
-    main(do_homework())
+    # Модули бота импортируют homework: пусть получат этот же модуль,
+    # а не выполнят файл повторно под другим именем.
+    sys.modules.setdefault('homework', sys.modules[__name__])
+    main()
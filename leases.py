@@ -0,0 +1,213 @@
+import os
+import socket
+import sqlite3
+import time
+
+from homework import logger
+from shards import ring_hash
+
+LEASE_DB = os.getenv('LEASE_DB')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 30))
+LEASE_BUCKETS = int(os.getenv('LEASE_BUCKETS', 64))
+LEASE_MARGIN = float(os.getenv('LEASE_MARGIN', 5))
+NODE_ID = os.getenv('NODE_ID')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    lease_group TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (lease_group, owner)
+);
+'''
+
+
+class SqliteLeases:
+    """Аренды в общей базе SQLite: замена распределённой блокировки.
+
+    Любой другой бэкенд должен предоставить те же методы heartbeat,
+    leave, acquire, release и close.
+    """
+
+    def __init__(self, path=LEASE_DB):
+        self.path = path
+        self._connection = None
+
+    @property
+    def connection(self):
+        """Соединение открывается при первом обращении."""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def heartbeat(self, group, owner, ttl, now):
+        """Отмечаю узел живым и возвращаю число живых узлов группы."""
+        connection = self.connection
+        connection.execute(
+            'INSERT OR REPLACE INTO nodes VALUES (?, ?, ?)',
+            (group, owner, now + ttl)
+        )
+        connection.execute('DELETE FROM nodes WHERE expires_at <= ?', (now,))
+        (count,) = connection.execute(
+            'SELECT COUNT(*) FROM nodes WHERE lease_group = ?', (group,)
+        ).fetchone()
+        return count
+
+    def leave(self, group, owner):
+        """Убираю узел из группы, его доля сразу делится между живыми."""
+        self.connection.execute(
+            'DELETE FROM nodes WHERE lease_group = ? AND owner = ?',
+            (group, owner)
+        )
+
+    def acquire(self, name, owner, ttl, now):
+        """Беру или продлеваю аренду, если она свободна, истекла или моя."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT owner, expires_at FROM leases WHERE name = ?', (name,)
+            ).fetchone()
+            acquired = row is None or row[0] == owner or row[1] <= now
+            if acquired:
+                connection.execute(
+                    'INSERT OR REPLACE INTO leases VALUES (?, ?, ?)',
+                    (name, owner, now + ttl)
+                )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return acquired
+
+    def release(self, name, owner):
+        """Освобождаю аренду, если она моя."""
+        self.connection.execute(
+            'DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner)
+        )
+
+    def close(self):
+        """Закрываю соединение."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class LeaseManager:
+    """Владение корзинами студентов для одного узла.
+
+    Студенты делятся на buckets корзин, каждую корзину опрашивает только
+    узел, держащий её аренду. Узел берёт не больше своей доли корзин,
+    лишние отпускает, а корзины упавших узлов забирает после истечения
+    аренды. Если продлить аренду не удалось, узел перестаёт опрашивать
+    корзину за margin секунд до её истечения, раньше, чем её сможет
+    взять другой узел.
+    """
+
+    def __init__(self, backend, owner, group='', buckets=LEASE_BUCKETS,
+                 ttl=LEASE_TTL, margin=LEASE_MARGIN):
+        self.backend = backend
+        self.owner = owner
+        self.group = group
+        self.buckets = buckets
+        self.ttl = ttl
+        self.margin = margin
+        self.owned = set()
+        self.expires = {}
+
+    def lease_name(self, bucket):
+        """Имя аренды корзины в бэкенде."""
+        return f'{self.group}/{bucket}'
+
+    def bucket_for(self, tenant_id):
+        """Корзина студента."""
+        return ring_hash(str(tenant_id)) % self.buckets
+
+    def owns(self, tenant_id, now=None):
+        """Опрашивает ли этот узел студента: аренда его корзины в силе."""
+        now = time.time() if now is None else now
+        bucket = self.bucket_for(tenant_id)
+        return (
+            bucket in self.owned
+            and now < self.expires.get(bucket, 0) - self.margin
+        )
+
+    def refresh(self, now=None):
+        """Продлеваю свои аренды и добираю долю; возвращаю новые корзины."""
+        now = time.time() if now is None else now
+        # Пока аренда была просрочена, корзину мог опрашивать другой узел:
+        # её состояние нужно перечитать, как у новой.
+        lapsed = {
+            bucket for bucket in self.owned
+            if now >= self.expires.get(bucket, 0) - self.margin
+        }
+        nodes = self.backend.heartbeat(self.group, self.owner, self.ttl, now)
+        share = -(-self.buckets // max(nodes, 1))
+        owned = self._renew(share, now)
+        self._claim(owned, share, now)
+        gained = (owned - self.owned) | (owned & lapsed)
+        lost = self.owned - owned
+        if gained or lost:
+            logger.info(
+                f'Аренды узла {self.owner}: получено {len(gained)}, '
+                f'потеряно {len(lost)}, всего {len(owned)}'
+            )
+        self.owned = owned
+        self.expires = {bucket: self.expires[bucket] for bucket in owned}
+        return gained
+
+    def _renew(self, share, now):
+        owned = set()
+        for bucket in sorted(self.owned):
+            name = self.lease_name(bucket)
+            if len(owned) >= share:
+                self.backend.release(name, self.owner)
+            elif self._acquire(bucket, now):
+                owned.add(bucket)
+        return owned
+
+    def _acquire(self, bucket, now):
+        name = self.lease_name(bucket)
+        if not self.backend.acquire(name, self.owner, self.ttl, now):
+            return False
+        # Срок считаю от момента до запроса: аренда в базе не короче.
+        self.expires[bucket] = now + self.ttl
+        return True
+
+    def _claim(self, owned, share, now):
+        # Узлы начинают поиск с разных корзин, чтобы меньше спорить.
+        start = ring_hash(self.owner) % self.buckets
+        for offset in range(self.buckets):
+            if len(owned) >= share:
+                return
+            bucket = (start + offset) % self.buckets
+            if bucket in owned:
+                continue
+            if self._acquire(bucket, now):
+                owned.add(bucket)
+
+    def release_all(self):
+        """Отпускаю все аренды при остановке."""
+        for bucket in self.owned:
+            self.backend.release(self.lease_name(bucket), self.owner)
+        self.backend.leave(self.group, self.owner)
+        self.owned = set()
+        self.expires = {}
+
+
+def make_leases(group=''):
+    """Менеджер аренд по настройкам окружения или None, если выключено."""
+    if not LEASE_DB:
+        return None
+    owner = NODE_ID or f'{socket.gethostname()}:{os.getpid()}'
+    return LeaseManager(SqliteLeases(LEASE_DB), owner, group=group)
@@ -0,0 +1,99 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_JSON = os.getenv('LOG_JSON', '').lower() in ('1', 'true', 'yes')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+LOG_DEBUG_SAMPLE = int(os.getenv('LOG_DEBUG_SAMPLE', 1))
+CONTEXT_FIELDS = ('tenant', 'poll')
+MAX_SAMPLED_TEMPLATES = 1000
+
+log_context = contextvars.ContextVar('log_context', default={})
+
+
+def bind(**fields):
+    """Добавляю поля ко всем записям лога текущей задачи asyncio."""
+    log_context.set({**log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Переносит поля из log_context в запись лога."""
+
+    def filter(self, record):
+        """Дописываю поля контекста, запись пропускаю всегда."""
+        for name, value in log_context.get().items():
+            setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает каждую rate-ю DEBUG-запись с одним и тем же шаблоном."""
+
+    def __init__(self, rate=LOG_DEBUG_SAMPLE):
+        super().__init__()
+        self.rate = max(rate, 1)
+        self.counts = {}
+
+    def filter(self, record):
+        """Решаю, оставить ли запись."""
+        if self.rate == 1 or record.levelno > logging.DEBUG:
+            return True
+        if len(self.counts) >= MAX_SAMPLED_TEMPLATES:
+            self.counts.clear()
+        count = self.counts.get(record.msg, 0)
+        self.counts[record.msg] = count + 1
+        return count % self.rate == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — один JSON-объект в строке."""
+
+    def format(self, record):
+        """Сериализую запись вместе с полями контекста."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'func': record.funcName,
+            'line': record.lineno,
+            'message': record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            if hasattr(record, name):
+                data[name] = getattr(record, name)
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def setup_logging(logger, formatter, json_output=LOG_JSON,
+                  level=LOG_LEVEL, sample=LOG_DEBUG_SAMPLE, stream=None):
+    """Перевожу логгер на очередь с записью в фоновом потоке.
+
+    Поток опроса только кладёт запись в очередь, форматирование и вывод
+    делает QueueListener. Возвращаю запущенный listener.
+    """
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter() if json_output else formatter)
+    records = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(SamplingFilter(sample))
+    handler.addFilter(ContextFilter())
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    listener = QueueListener(records, target, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener):
+    """Дописываю оставшиеся записи и останавливаю поток вывода."""
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,239 @@
+import bisect
+import os
+import threading
+
+from aiohttp import web
+
+from exceptions import (ApiAnswerError, MessageNotSent,
+                        WrongHomeworkStatus)
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+# Классы ошибок в метрике: уточнённые исключения считаются по базовому.
+ERROR_CLASSES = (
+    ApiAnswerError, WrongHomeworkStatus, MessageNotSent, TypeError, KeyError
+)
+
+
+class Registry:
+    """Набор метрик, который отдаётся одной страницей."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Добавляю метрику."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def format_labels(labelnames, values, extra=()):
+    """Метки в формате {name="value",...}."""
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+class Metric:
+    """Общая часть метрик: имя, описание и значения по наборам меток."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels):
+        """Текущее значение для набора меток."""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """Строки значений для страницы метрик."""
+        return [
+            f'{self.name}{format_labels(self.labelnames, key)} {value}'
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Counter(Metric):
+    """Счётчик, который только растёт."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Увеличиваю счётчик."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        """Сумма по всем наборам меток."""
+        return sum(self._values.values())
+
+
+class Gauge(Metric):
+    """Текущее значение; function, если задана, вычисляется при чтении."""
+
+    kind = 'gauge'
+
+    def __init__(self, *args, function=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function = function
+
+    def set(self, value, **labels):
+        """Устанавливаю значение."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Значение будет вычисляться при каждом чтении."""
+        self.function = function
+
+    def samples(self):
+        """Строки значений для страницы метрик."""
+        if self.function is not None:
+            return [f'{self.name} {self.function()}']
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам, как в Prometheus."""
+
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets=LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """Учитываю одно наблюдение."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0)
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        """Число наблюдений для набора меток."""
+        counts, _ = self._values.get(self._key(labels), ([0], 0))
+        return sum(counts)
+
+    def samples(self):
+        """Строки корзин, суммы и количества наблюдений."""
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, [('le', bound)])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def error_type(error):
+    """Метка ошибки: её класс из ERROR_CLASSES, иначе собственный класс."""
+    for kind in ERROR_CLASSES:
+        if isinstance(error, kind):
+            return kind.__name__
+    return type(error).__name__
+
+
+API_LATENCY = Histogram(
+    'homework_api_request_seconds', 'Время запроса к API Практикума'
+)
+API_QUEUE_WAIT = Histogram(
+    'homework_api_queue_wait_seconds',
+    'Ожидание разрешения ограничителя перед запросом к API'
+)
+SEND_LATENCY = Histogram(
+    'homework_telegram_send_seconds', 'Время отправки сообщения в Телеграм'
+)
+NOTIFICATION_LAG = Histogram(
+    'homework_notification_lag_seconds',
+    'От смены статуса в API до доставки уведомления', buckets=LAG_BUCKETS
+)
+ERRORS = Counter(
+    'homework_errors_total', 'Ошибки по классу исключения', ['type']
+)
+
+TRANSITIONS = Counter(
+    'homework_status_transitions_total', 'Изменения статусов работ',
+    ['old', 'new']
+)
+POLLS = Counter('homework_polls_total', 'Опросы API')
+API_COALESCED = Counter(
+    'homework_api_coalesced_total',
+    'Запросы к API, обслуженные чужим запросом или кэшем', ['source']
+)
+SEND_QUEUE_DEPTH = Gauge(
+    'homework_send_queue_depth', 'Сообщений в очереди отправки'
+)
+SCHEDULER_LAG = Gauge(
+    'homework_scheduler_lag_seconds',
+    'Опоздание последнего запущенного опроса относительно плана'
+)
+API_BREAKER_OPEN = Gauge(
+    'homework_api_breaker_open', 'Запросы к API приостановлены размыкателем'
+)
+STARTUP_SECONDS = Gauge(
+    'homework_startup_seconds', 'От запуска процесса до первого опроса'
+)
+SCHEDULED_JOBS = Gauge(
+    'homework_scheduled_jobs', 'Задач опроса в очереди планировщика'
+)
+
+
+async def metrics_view(request):
+    """Страница /metrics."""
+    return web.Response(
+        text=request.app['registry'].render(),
+        content_type='text/plain', charset='utf-8'
+    )
+
+
+async def start_server(port=METRICS_PORT, host=METRICS_HOST,
+                       registry=REGISTRY):
+    """Запускаю HTTP-сервер метрик в текущем цикле событий."""
+    app = web.Application()
+    app['registry'] = registry
+    app.router.add_get('/metrics', metrics_view)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import random
+from collections import namedtuple
+
+from homework import logger
+
+OUTBOX_COMMIT_DELAY = float(os.getenv('OUTBOX_COMMIT_DELAY', 0.05))
+OUTBOX_BACKOFF = float(os.getenv('OUTBOX_BACKOFF', 5))
+OUTBOX_MAX_BACKOFF = float(os.getenv('OUTBOX_MAX_BACKOFF', 600))
+OUTBOX_RETRY_INTERVAL = float(os.getenv('OUTBOX_RETRY_INTERVAL', 5))
+
+Pending = namedtuple('Pending', ['id', 'text', 'attempts', 'retry_at'])
+
+
+def retry_delay(attempts, backoff=None, limit=None):
+    """Пауза до повтора: растёт вдвое с каждой неудачей, со случайностью."""
+    backoff = OUTBOX_BACKOFF if backoff is None else backoff
+    limit = OUTBOX_MAX_BACKOFF if limit is None else limit
+    delay = min(limit, backoff * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+
+class Outbox:
+    """Групповая запись исходящих уведомлений перед отправкой.
+
+    Уведомление сначала попадает в пачку хранилища, а в очередь отправки
+    уходит только после записи пачки на диск. Пачка копится delay
+    секунд, поэтому одна синхронизация с диском обслуживает все
+    уведомления, появившиеся за это время.
+    """
+
+    def __init__(self, commit, delay=OUTBOX_COMMIT_DELAY):
+        self.commit = commit
+        self.delay = delay
+        self._staged = []
+        self._committer = None
+
+    def __len__(self):
+        """Уведомлений, ждущих записи на диск."""
+        return len(self._staged)
+
+    def stage(self, submit):
+        """Вызову submit() после записи текущей пачки на диск."""
+        self._staged.append(submit)
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.ensure_future(self._group_commit())
+
+    async def _group_commit(self):
+        await asyncio.sleep(self.delay)
+        staged, self._staged = self._staged, []
+        try:
+            await self.commit()
+        except Exception as error:
+            # Отправка важнее: уведомление уходит, а его запись
+            # осталась в хранилище и повторится при следующей записи.
+            logger.error(f'Не удалось записать исходящие уведомления: {error}')
+        for submit in staged:
+            submit()
+        if self._staged:
+            self._committer = asyncio.ensure_future(self._group_commit())
+
+    async def drain(self):
+        """Дожидаюсь записи и отправки всех отложенных уведомлений."""
+        while self._committer is not None and not self._committer.done():
+            await self._committer
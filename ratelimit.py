@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+API_GLOBAL_RATE = float(os.getenv('API_GLOBAL_RATE', 10))
+API_GLOBAL_BURST = float(os.getenv('API_GLOBAL_BURST', API_GLOBAL_RATE))
+API_TOKEN_RATE = float(os.getenv('API_TOKEN_RATE', 1))
+API_TOKEN_BURST = float(os.getenv('API_TOKEN_BURST', 5))
+BUCKETS_PRUNE_SIZE = 10000
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity сразу.
+
+    Токены резервируются заранее, поэтому ожидающие встают в очередь
+    в порядке обращения, а баланс может уходить в минус. Запас не меньше
+    одного токена, иначе при rate < 1 токен не выдавался бы никогда.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = max(capacity or rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def reserve(self, now=None):
+        """Забираю токен и возвращаю, сколько секунд ждать до него."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+    def wait_time(self, now=None):
+        """Сколько секунд ждать до токена, не забирая его."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return max(0, (1 - self.tokens) / self.rate)
+
+    def pause(self, seconds, now=None):
+        """Запрещаю выдачу токенов на seconds секунд."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+    def idle(self, now=None):
+        """Ведро полное: о нём можно забыть без потери ограничения."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    async def acquire(self):
+        """Жду своей очереди на токен."""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class KeyedBuckets:
+    """Вёдра токенов по ключу: у каждого ключа своё ведро.
+
+    Когда вёдер набирается prune_size, полные забываются: новое ведро
+    для того же ключа ограничивает так же.
+    """
+
+    def __init__(self, rate, capacity=None, prune_size=BUCKETS_PRUNE_SIZE):
+        self.rate = rate
+        self.capacity = capacity
+        self.prune_size = prune_size
+        self._buckets = {}
+
+    def __len__(self):
+        """Число хранимых вёдер."""
+        return len(self._buckets)
+
+    def get(self, key):
+        """Ведро ключа, при необходимости новое."""
+        if len(self._buckets) >= self.prune_size:
+            self._buckets = {
+                known: bucket for known, bucket in self._buckets.items()
+                if not bucket.idle()
+            }
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+            self._buckets[key] = bucket
+        return bucket
+
+
+class PriorityLimiter:
+    """Ведро токенов, в котором ожидающие обслуживаются по приоритету.
+
+    Пока токенов хватает, acquire не ждёт. Иначе ожидающие встают в кучу
+    по (priority, порядок обращения), меньший priority получает токен
+    раньше.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.bucket = TokenBucket(rate, capacity)
+        self._waiters = []
+        self._counter = itertools.count()
+        self._dispatcher = None
+
+    def __len__(self):
+        """Число ожидающих токена."""
+        return len(self._waiters)
+
+    async def acquire(self, priority=0):
+        """Жду токена с учётом приоритета."""
+        if not self._waiters and self.bucket.wait_time() == 0:
+            self.bucket.reserve()
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._waiters:
+            delay = self.bucket.wait_time()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.bucket.reserve()
+                future.set_result(None)
+
+
+class ApiLimiter:
+    """Ограничение запросов к API: на каждый токен и общее на воркер.
+
+    Нулевая частота отключает соответствующее ограничение.
+    """
+
+    def __init__(self, global_rate=API_GLOBAL_RATE,
+                 global_burst=API_GLOBAL_BURST, token_rate=API_TOKEN_RATE,
+                 token_burst=API_TOKEN_BURST):
+        self.global_limiter = None
+        if global_rate:
+            self.global_limiter = PriorityLimiter(global_rate, global_burst)
+        self.token_rate = token_rate
+        self.token_buckets = KeyedBuckets(token_rate, token_burst)
+
+    async def acquire(self, token, priority=0):
+        """Жду разрешения на запрос и возвращаю время ожидания."""
+        started = time.monotonic()
+        if self.token_rate:
+            await self.token_buckets.get(token).acquire()
+        if self.global_limiter is not None:
+            await self.global_limiter.acquire(priority)
+        return time.monotonic() - started
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import random
+from collections import deque
+
+from homework import API_RETRIES, API_RETRY_BACKOFF
+
+API_HEDGE = os.getenv('API_HEDGE', '').lower() in ('1', 'true', 'yes')
+API_HEDGE_PERCENTILE = float(os.getenv('API_HEDGE_PERCENTILE', 0.95))
+LATENCY_WINDOW = 500
+LATENCY_MIN_SAMPLES = 20
+
+
+def backoff_delay(attempt, backoff=API_RETRY_BACKOFF):
+    """Пауза перед повтором: случайная в пределах растущего окна."""
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+async def with_retries(function, retry_on, retries=API_RETRIES,
+                       backoff=API_RETRY_BACKOFF):
+    """Вызываю function() и повторяю не больше retries раз при retry_on."""
+    for attempt in range(retries + 1):
+        try:
+            return await function()
+        except retry_on:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff_delay(attempt, backoff))
+
+
+class LatencyTracker:
+    """Скользящее окно времени ответов для выбора момента подстраховки."""
+
+    def __init__(self, window=LATENCY_WINDOW, min_samples=LATENCY_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def observe(self, seconds):
+        """Учитываю время ответа."""
+        self._samples.append(seconds)
+
+    def percentile(self, share):
+        """Перцентиль окна или None, пока наблюдений мало."""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+async def hedged(function, delay, hedge=None):
+    """Подстраховочный запрос: второй вызов, если первый не успел за delay.
+
+    Вторым вызывается hedge(), по умолчанию — снова function(). Возвращаю
+    первый успешный результат, оставшийся вызов отменяю. Если delay
+    равен None, делаю один вызов.
+    """
+    hedge = function if hedge is None else hedge
+    first = asyncio.ensure_future(function())
+    if delay is None:
+        return await first
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            pending.add(asyncio.ensure_future(hedge()))
+        while not done:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            if pending and all(task.exception() for task in done):
+                done = set()
+        successful = [task for task in done if task.exception() is None]
+        return (successful or list(done))[0].result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+
+from homework import RETRY_TIME
+
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.1))
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', 60))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 3600))
+POLL_REVIEWING_INTERVAL = float(os.getenv('POLL_REVIEWING_INTERVAL', 120))
+POLL_IDLE_INTERVAL = float(os.getenv('POLL_IDLE_INTERVAL', 1800))
+POLL_IDLE_AFTER = float(os.getenv('POLL_IDLE_AFTER', 3600 * 24 * 14))
+POLL_BUDGET = float(os.getenv('POLL_BUDGET', 0))
+MAX_BACKOFF_POWER = 16
+
+
+class Scheduler:
+    """Очередь задач опроса, упорядоченная по времени следующего запроса."""
+
+    def __init__(self, interval=RETRY_TIME, jitter=POLL_JITTER,
+                 min_interval=POLL_MIN_INTERVAL,
+                 max_interval=POLL_MAX_INTERVAL, budget=POLL_BUDGET):
+        self.interval = interval
+        self.jitter = jitter
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = budget
+        self._rates = {}
+        self._total_rate = 0
+        self.lag = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._changed = None
+
+    def __len__(self):
+        """Количество задач в очереди."""
+        return len(self._heap)
+
+    def add(self, job, delay):
+        """Ставлю задачу в очередь через delay секунд."""
+        due = time.monotonic() + delay
+        heapq.heappush(self._heap, (due, next(self._counter), job))
+        if self._changed is not None:
+            self._changed.set()
+
+    def spread(self, jobs):
+        """Равномерно распределяю первые запросы по окну RETRY_TIME.
+
+        Первый запрос делается сразу, чтобы после перезапуска не ждать
+        случайную долю окна.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        slot = self.interval / len(jobs)
+        for index, job in enumerate(jobs):
+            offset = random.uniform(0, slot) if index else 0
+            self.add(job, index * slot + offset)
+
+    def reschedule(self, job):
+        """Ставлю задачу на следующий цикл со случайным смещением."""
+        interval = self.interval_for(job)
+        spread = interval * self.jitter
+        self.add(job, interval + random.uniform(-spread, spread))
+
+    def interval_for(self, job, now=None):
+        """Интервал до следующего запроса по состоянию задачи.
+
+        После ошибок API интервал растёт экспоненциально, пока работа на
+        ревью — сокращается, у давно неактивных студентов — растёт.
+        """
+        now = time.time() if now is None else now
+        if job.errors:
+            power = min(job.errors, MAX_BACKOFF_POWER)
+            interval = self.interval * 2 ** power
+        elif job.reviewing:
+            interval = POLL_REVIEWING_INTERVAL
+        elif now - job.changed_at >= POLL_IDLE_AFTER:
+            interval = POLL_IDLE_INTERVAL
+        else:
+            interval = self.interval
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.apply_budget(job, interval)
+
+    def apply_budget(self, job, interval):
+        """Растягиваю интервал, если суммарная частота выше бюджета.
+
+        Бюджет задаётся в запросах в час на весь воркер.
+        """
+        if not self.budget:
+            return interval
+        rate = 3600 / interval
+        self._total_rate += rate - self._rates.get(job.tenant_id, 0)
+        self._rates[job.tenant_id] = rate
+        return interval * max(1, self._total_rate / self.budget)
+
+    async def next_due(self):
+        """Жду и возвращаю задачу, время которой наступило."""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        while True:
+            self._changed.clear()
+            delay = None
+            if self._heap:
+                due, _, job = self._heap[0]
+                delay = due - time.monotonic()
+                if delay <= 0:
+                    heapq.heappop(self._heap)
+                    self.lag = -delay
+                    return job
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from exceptions import MessageNotSent
+from homework import logger
+from ratelimit import KeyedBuckets, TokenBucket
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', 3))
+SENDER_WORKERS = int(os.getenv('SENDER_WORKERS', 4))
+SEND_QUEUE_SIZE = int(os.getenv('SEND_QUEUE_SIZE', 10000))
+SEND_RETRIES = int(os.getenv('SEND_RETRIES', 3))
+HIGH_WATER = 0.8
+
+Outgoing = namedtuple(
+    'Outgoing', ['chat_id', 'text', 'callback', 'attempt', 'reserved']
+)
+
+
+def retry_after(error):
+    """Пауза из ответа 429 Телеграма (telegram.error.RetryAfter) или None.
+
+    Класс ошибки не импортируется, чтобы python-telegram-bot загружался
+    только при первой отправке.
+    """
+    return getattr(error, 'retry_after', None)
+
+
+class TelegramSender:
+    """Очередь исходящих сообщений с ограничением частоты отправки.
+
+    Отправку выполняет пул воркеров, каждое сообщение ждёт токен общего
+    ведра и ведра своего чата. Сообщение, которому токен чата достанется
+    не сразу, ждёт его вне воркера и возвращается в очередь, так что
+    частый чат не занимает пул. Опрос API кладёт сообщения в очередь и не
+    ждёт доставки: о результате сообщает callback(delivered).
+    """
+
+    def __init__(self, bot, workers=SENDER_WORKERS,
+                 queue_size=SEND_QUEUE_SIZE,
+                 global_rate=TELEGRAM_GLOBAL_RATE,
+                 chat_rate=TELEGRAM_CHAT_RATE,
+                 chat_burst=TELEGRAM_CHAT_BURST):
+        self.bot = bot
+        self.workers = workers
+        self.queue_size = queue_size
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_buckets = KeyedBuckets(chat_rate, chat_burst)
+        self.queue = None
+        self.overloaded = False
+        self._executor = None
+        self._tasks = []
+        self._deferred = set()
+
+    def start(self):
+        """Запускаю воркеров в текущем цикле событий."""
+        self.queue = asyncio.Queue(self.queue_size)
+        self._executor = ThreadPoolExecutor(self.workers)
+        self._tasks = [
+            asyncio.ensure_future(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Останавливаю воркеров, неотправленное остаётся в очереди."""
+        tasks = self._tasks + list(self._deferred)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    async def join(self):
+        """Жду, пока очередь опустеет и отложенных сообщений не останется."""
+        while True:
+            await self.queue.join()
+            if not self._deferred:
+                return
+            await asyncio.wait(list(self._deferred))
+
+    @property
+    def backpressure(self):
+        """Заполненность очереди от 0 до 1 с учётом отложенных."""
+        return (self.queue.qsize() + len(self._deferred)) / self.queue_size
+
+    def submit(self, chat_id, text, callback=None):
+        """Ставлю сообщение в очередь, False — если очередь переполнена."""
+        return self._put(Outgoing(chat_id, text, callback, 0, False))
+
+    def _put(self, outgoing):
+        try:
+            self.queue.put_nowait(outgoing)
+        except asyncio.QueueFull:
+            logger.error('Очередь отправки в Телеграм переполнена')
+            return False
+        overloaded = self.backpressure >= HIGH_WATER
+        if overloaded and not self.overloaded:
+            logger.warning(
+                f'Очередь отправки заполнена на {self.backpressure:.0%}'
+            )
+        self.overloaded = overloaded
+        return True
+
+    async def _work(self):
+        while True:
+            outgoing = await self.queue.get()
+            try:
+                await self._deliver(outgoing)
+            except Exception as error:
+                logger.error(f'Сбой в очереди отправки: {error}')
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, outgoing):
+        bucket = self.chat_buckets.get(outgoing.chat_id)
+        if not outgoing.reserved:
+            delay = bucket.reserve()
+            if delay:
+                self._defer(outgoing._replace(reserved=True), delay)
+                return
+        await self.global_bucket.acquire()
+        try:
+            await self.send(outgoing.chat_id, outgoing.text)
+        except MessageNotSent as error:
+            logger.error(error)
+            metrics.ERRORS.inc(type=metrics.error_type(error))
+            self._retry(outgoing)
+            return
+        except Exception as error:
+            if retry_after(error) is None:
+                raise
+            logger.warning(
+                f'Телеграм просит подождать {error.retry_after} с'
+            )
+            metrics.ERRORS.inc(type=metrics.error_type(error))
+            bucket.pause(error.retry_after)
+            self.global_bucket.pause(error.retry_after)
+            self._retry(outgoing)
+            return
+        self._done(outgoing, True)
+
+    def _defer(self, outgoing, delay):
+        task = asyncio.ensure_future(self._requeue(outgoing, delay))
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def _requeue(self, outgoing, delay):
+        """Возвращаю сообщение в очередь, когда подойдёт токен его чата."""
+        await asyncio.sleep(delay)
+        if not self._put(outgoing):
+            self._done(outgoing, False)
+
+    def _retry(self, outgoing):
+        if outgoing.attempt + 1 >= SEND_RETRIES or not self._put(
+            outgoing._replace(attempt=outgoing.attempt + 1, reserved=False)
+        ):
+            self._done(outgoing, False)
+
+    def _done(self, outgoing, delivered):
+        if outgoing.callback is not None:
+            outgoing.callback(delivered)
+
+    async def send(self, chat_id, text):
+        """Отправка сообщения в Телеграм в потоке пула."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            await loop.run_in_executor(
+                self._executor, self.bot.send_message, chat_id, text
+            )
+        except Exception as error:
+            if retry_after(error) is not None:
+                raise
+            raise MessageNotSent(
+                f'Ошибка при отправке сообщения в Телеграм: {error}'
+            )
+        finally:
+            metrics.SEND_LATENCY.observe(time.monotonic() - started)
+        logger.info('Сообщение отправлено в Телеграм')
@@ -0,0 +1,219 @@
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import time
+
+import metrics
+from engine import Engine, PollJob
+from history import make_history
+from homework import TELEGRAM_TOKEN, LazyBot, formatter, logger
+from logconfig import setup_logging
+from ratelimit import API_GLOBAL_BURST, API_GLOBAL_RATE, ApiLimiter
+from sender import TELEGRAM_GLOBAL_RATE, TelegramSender
+from storage import STATE_DB, Store
+
+WORKER_SHARDS = int(os.getenv('WORKER_SHARDS', 1))
+SHARD_VNODES = int(os.getenv('SHARD_VNODES', 100))
+SHARD_REPORT_INTERVAL = float(os.getenv('SHARD_REPORT_INTERVAL', 30))
+SHARD_STALE_AFTER = 3
+
+
+def ring_hash(value):
+    """Позиция строки на кольце, одинаковая во всех процессах."""
+    digest = hashlib.md5(value.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class HashRing:
+    """Консистентное хеширование студентов по шардам.
+
+    Каждый шард занимает vnodes точек кольца, поэтому при изменении
+    числа шардов переезжает примерно 1/N студентов.
+    """
+
+    def __init__(self, shards, vnodes=SHARD_VNODES):
+        if shards < 1:
+            raise ValueError('Число шардов должно быть положительным.')
+        points = sorted(
+            (ring_hash(f'{shard}:{vnode}'), shard)
+            for shard in range(shards) for vnode in range(vnodes)
+        )
+        self.shards = shards
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        """Номер шарда, которому принадлежит ключ."""
+        index = bisect.bisect(self._hashes, ring_hash(str(key)))
+        return self._owners[index % len(self._owners)]
+
+    def assign(self, tenants):
+        """Раскладываю студентов по шардам по их id."""
+        assignment = {shard: [] for shard in range(self.shards)}
+        for tenant in tenants:
+            assignment[self.shard_for(tenant.id)].append(tenant)
+        return assignment
+
+
+def shard_report(index, engine):
+    """Состояние и счётчики шарда для супервизора."""
+    return {
+        'shard': index,
+        'pid': os.getpid(),
+        'time': time.time(),
+        'jobs': len(engine.jobs),
+        'polls': metrics.POLLS.total(),
+        'errors': metrics.ERRORS.total(),
+        'sent': metrics.SEND_LATENCY.count(),
+        'queue': engine.sender.queue.qsize(),
+    }
+
+
+async def report_forever(index, engine, reports, interval):
+    """Периодически отправляю супервизору отчёт шарда."""
+    while True:
+        await asyncio.sleep(interval)
+        reports.put(shard_report(index, engine))
+
+
+async def run_engine(index, engine, reports, interval):
+    """Работа движка шарда вместе с отправкой отчётов."""
+    reporter = asyncio.ensure_future(
+        report_forever(index, engine, reports, interval)
+    )
+    try:
+        await engine.run()
+    finally:
+        reporter.cancel()
+
+
+def shard_limiters(bot, shards):
+    """Очередь отправки и ограничитель API шарда.
+
+    Общие лимиты Телеграма и API действуют на весь бот, поэтому каждый
+    из shards шардов получает свою долю. Лимиты на чат и на токен
+    не делятся: студент опрашивается только одним шардом.
+    """
+    sender = TelegramSender(bot, global_rate=TELEGRAM_GLOBAL_RATE / shards)
+    api_limiter = ApiLimiter(
+        global_rate=API_GLOBAL_RATE / shards,
+        global_burst=API_GLOBAL_BURST / shards
+    )
+    return sender, api_limiter
+
+
+def run_shard(index, tenants, reports, interval=SHARD_REPORT_INTERVAL,
+              shards=1):
+    """Точка входа процесса шарда: свой цикл опроса и своя очередь."""
+    # Модуль аренд использует ring_hash отсюда, поэтому импорт отложен.
+    from leases import make_leases
+
+    setup_logging(logger, formatter)
+    logger.info(f'Шард {index}: студентов {len(tenants)}')
+    metrics_port = metrics.METRICS_PORT + index if metrics.METRICS_PORT else 0
+    bot = LazyBot(TELEGRAM_TOKEN)
+    sender, api_limiter = shard_limiters(bot, shards)
+    engine = Engine(
+        bot, [PollJob(*tenant) for tenant in tenants], store=Store(STATE_DB),
+        sender=sender, metrics_port=metrics_port,
+        leases=make_leases(group=f'shard{index}'), history=make_history(),
+        api_limiter=api_limiter
+    )
+    reports.put(shard_report(index, engine))
+    try:
+        asyncio.run(run_engine(index, engine, reports, interval))
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    """Запускает процессы шардов, следит за ними и собирает отчёты."""
+
+    def __init__(self, tenants, shards=WORKER_SHARDS, target=run_shard,
+                 interval=SHARD_REPORT_INTERVAL, context=None):
+        self.ring = HashRing(shards)
+        self.assignment = self.ring.assign(tenants)
+        self.target = target
+        self.interval = interval
+        self.context = context or multiprocessing.get_context()
+        self.reports = self.context.Queue()
+        self.processes = {}
+        self.health = {}
+
+    def start_shard(self, index):
+        """Запускаю процесс одного шарда."""
+        tenants = self.assignment[index]
+        process = self.context.Process(
+            target=self.target, name=f'shard-{index}', daemon=True,
+            args=(
+                index, tenants, self.reports, self.interval, self.ring.shards
+            )
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(
+            f'Шард {index} запущен: pid {process.pid}, '
+            f'студентов {len(tenants)}'
+        )
+
+    def start(self):
+        """Запускаю все шарды."""
+        for index in range(self.ring.shards):
+            self.start_shard(index)
+
+    def collect(self, timeout=0):
+        """Забираю накопившиеся отчёты, ожидая первый до timeout секунд."""
+        try:
+            report = self.reports.get(timeout=timeout)
+            while True:
+                self.health[report['shard']] = report
+                report = self.reports.get_nowait()
+        except queue.Empty:
+            pass
+
+    def check(self, now=None):
+        """Перезапускаю упавшие шарды и предупреждаю о зависших."""
+        now = time.time() if now is None else now
+        for index, process in list(self.processes.items()):
+            if not process.is_alive():
+                logger.error(
+                    f'Шард {index} завершился с кодом {process.exitcode}, '
+                    'перезапускаю'
+                )
+                self.health.pop(index, None)
+                self.start_shard(index)
+                continue
+            report = self.health.get(index)
+            stale = self.interval * SHARD_STALE_AFTER
+            if report is not None and now - report['time'] > stale:
+                logger.warning(f'Шард {index} давно не присылал отчёт')
+
+    def totals(self):
+        """Суммарные счётчики по последним отчётам шардов."""
+        totals = dict.fromkeys(('jobs', 'polls', 'errors', 'sent', 'queue'), 0)
+        for report in self.health.values():
+            for name in totals:
+                totals[name] += report[name]
+        return totals
+
+    def stop(self):
+        """Останавливаю шарды."""
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join()
+
+    def run(self):
+        """Работаю до прерывания, раз в interval логирую сводку."""
+        self.start()
+        try:
+            while True:
+                self.collect(self.interval)
+                self.check()
+                logger.info(f'Сводка по шардам: {self.totals()}')
+        finally:
+            self.stop()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import metrics
+from cache import TTLCache
+
+API_CACHE_TTL = float(os.getenv('API_CACHE_TTL', 10))
+PRUNE_SIZE = 1000
+
+
+class SingleFlight:
+    """Один запрос к API на ключ, сколько бы вызовов ни пришло сразу.
+
+    Пока запрос по ключу (токен, from_date) выполняется, остальные
+    вызовы ждут его и получают тот же результат. Успешный ответ ещё ttl
+    секунд отдаётся из кэша тем, кто готов принять его. Ошибки и ответы
+    304 (None) не кэшируются.
+    """
+
+    def __init__(self, ttl=API_CACHE_TTL):
+        self.cache = TTLCache(ttl)
+        self._calls = {}
+        self._prune_size = PRUNE_SIZE
+
+    def __len__(self):
+        """Число запросов, выполняющихся сейчас."""
+        return len(self._calls)
+
+    async def do(self, key, function, *args, cached=True):
+        """Результат function(*args), общий для одновременных вызовов.
+
+        При cached=False кэш не читается: вызов может только дождаться
+        уже выполняющегося запроса.
+        """
+        result = self.cache.get(key) if cached else None
+        if result is not None:
+            metrics.API_COALESCED.inc(source='cache')
+            return result
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            metrics.API_COALESCED.inc(source='inflight')
+        # Отмена одного ожидающего не должна отменять запрос остальным.
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        del self._calls[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result() is not None:
+            self.cache.set(key, task.result())
+        if len(self.cache) > self._prune_size:
+            self.cache.prune()
+            self._prune_size = max(PRUNE_SIZE, len(self.cache) * 2)
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+
+STATE_DB = os.getenv('STATE_DB', 'state.sqlite3')
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 5))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    tenant_id TEXT PRIMARY KEY,
+    cursor INTEGER,
+    synced_at INTEGER,
+    previos_message TEXT NOT NULL DEFAULT '',
+    changed_at REAL
+);
+CREATE TABLE IF NOT EXISTS statuses (
+    tenant_id TEXT NOT NULL,
+    homework_key NOT NULL,
+    status TEXT,
+    homework_name TEXT,
+    PRIMARY KEY (tenant_id, homework_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pending (
+    id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_tenant ON pending (tenant_id);
+'''
+
+TenantState = namedtuple(
+    'TenantState',
+    ['cursor', 'synced_at', 'previos_message', 'changed_at', 'statuses',
+     'names', 'pending']
+)
+Batch = namedtuple('Batch', ['cursors', 'statuses', 'added', 'done'])
+
+
+def migrate(connection):
+    """Довожу схему базы, созданной прежней версией, до текущей."""
+    columns = {
+        row[1] for row in connection.execute('PRAGMA table_info(statuses)')
+    }
+    if 'homework_name' not in columns:
+        connection.execute(
+            'ALTER TABLE statuses ADD COLUMN homework_name TEXT'
+        )
+    columns = {
+        row[1] for row in connection.execute('PRAGMA table_info(cursors)')
+    }
+    if 'changed_at' not in columns:
+        connection.execute('ALTER TABLE cursors ADD COLUMN changed_at REAL')
+
+
+class Store:
+    """Состояние опроса в SQLite: курсоры, статусы и неотправленное."""
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self._connection = None
+        self._cursors = {}
+        self._statuses = {}
+        self._added = {}
+        self._done = set()
+
+    @property
+    def connection(self):
+        """Соединение открывается при первом обращении."""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Исходящие уведомления должны пережить сбой питания:
+            # каждая пачка синхронизируется с диском при коммите.
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.executescript(SCHEMA)
+            migrate(connection)
+            self._connection = connection
+        return self._connection
+
+    def load(self, tenant_id):
+        """Читаю сохранённое состояние одного студента."""
+        connection = self.connection
+        row = connection.execute(
+            'SELECT cursor, synced_at, previos_message, changed_at '
+            'FROM cursors WHERE tenant_id = ?', (tenant_id,)
+        ).fetchone() or (None, None, '', None)
+        statuses, names = {}, {}
+        for key, status, name in connection.execute(
+            'SELECT homework_key, status, homework_name FROM statuses '
+            'WHERE tenant_id = ?', (tenant_id,)
+        ):
+            statuses[key] = status
+            names[key] = name
+        pending = connection.execute(
+            'SELECT id, text FROM pending WHERE tenant_id = ? '
+            'ORDER BY created_at', (tenant_id,)
+        ).fetchall()
+        return TenantState(*row, statuses, names, pending)
+
+    def save_cursor(self, tenant_id, cursor, synced_at, previos_message,
+                    changed_at=None):
+        """Запоминаю курсор студента до следующей записи пачки.
+
+        changed_at — когда статусы студента менялись в последний раз:
+        по нему планировщик решает, пора ли опрашивать реже, и после
+        перезапуска отсчёт не должен начинаться заново.
+        """
+        self._cursors[tenant_id] = (
+            tenant_id, cursor, synced_at, previos_message, changed_at
+        )
+
+    def save_status(self, tenant_id, homework_key, status,
+                    homework_name=None):
+        """Запоминаю последний статус работы."""
+        self._statuses[tenant_id, homework_key] = (
+            tenant_id, homework_key, status, homework_name
+        )
+
+    def add_pending(self, tenant_id, text):
+        """Запоминаю неотправленное уведомление и возвращаю его id."""
+        pending_id = uuid.uuid4().hex
+        self._added[pending_id] = (pending_id, tenant_id, text, time.time())
+        return pending_id
+
+    def remove_pending(self, pending_id):
+        """Отмечаю уведомление отправленным."""
+        if self._added.pop(pending_id, None) is None:
+            self._done.add(pending_id)
+
+    def take_batch(self):
+        """Забираю накопленные изменения для записи одной транзакцией."""
+        batch = Batch(
+            list(self._cursors.values()), list(self._statuses.values()),
+            list(self._added.values()), [(id,) for id in self._done]
+        )
+        self._cursors, self._statuses = {}, {}
+        self._added, self._done = {}, set()
+        return batch
+
+    def restore(self, batch):
+        """Возвращаю незаписанную пачку к накопленному.
+
+        Изменения, накопленные после take_batch, новее пачки и остаются.
+        Уведомление, отправленное за это время, в исходящие не попадает.
+        """
+        for row in batch.cursors:
+            self._cursors.setdefault(row[0], row)
+        for row in batch.statuses:
+            self._statuses.setdefault((row[0], row[1]), row)
+        for row in batch.added:
+            if row[0] in self._done:
+                self._done.discard(row[0])
+            else:
+                self._added.setdefault(row[0], row)
+        self._done.update(id for (id,) in batch.done)
+
+    def write(self, batch):
+        """Записываю пачку изменений одной транзакцией."""
+        if not any(batch):
+            return
+        connection = self.connection
+        connection.execute('BEGIN')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?, ?)',
+                batch.cursors
+            )
+            connection.executemany(
+                'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?, ?)',
+                batch.statuses
+            )
+            connection.executemany(
+                'INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?)',
+                batch.added
+            )
+            connection.executemany(
+                'DELETE FROM pending WHERE id = ?', batch.done
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def flush(self):
+        """Записываю всё накопленное, при ошибке оставляю его на потом."""
+        batch = self.take_batch()
+        try:
+            self.write(batch)
+        except Exception:
+            self.restore(batch)
+            raise
+
+    def close(self):
+        """Закрываю соединение."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
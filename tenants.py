@@ -0,0 +1,50 @@
+import json
+import os
+import sqlite3
+from collections import namedtuple
+
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+TENANTS_TABLE = os.getenv('TENANTS_TABLE', 'tenants')
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+Tenant = namedtuple('Tenant', ['id', 'token', 'chat_id'])
+
+
+def load_tenants_json(path):
+    """Читаю реестр студентов из JSON-файла со списком объектов."""
+    with open(path, encoding='utf-8') as file:
+        records = json.load(file)
+    if not isinstance(records, list):
+        raise TypeError('Реестр студентов должен быть списком.')
+    return [
+        Tenant(str(record['id']), record['token'], record['chat_id'])
+        for record in records
+    ]
+
+
+def load_tenants_sqlite(path, table=TENANTS_TABLE):
+    """Читаю реестр студентов из таблицы SQLite (id, token, chat_id)."""
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            f'SELECT id, token, chat_id FROM {table}'
+        ).fetchall()
+    finally:
+        connection.close()
+    return [Tenant(str(id), token, chat_id) for id, token, chat_id in rows]
+
+
+def load_tenants(path):
+    """Загружаю реестр студентов, формат определяю по расширению файла."""
+    if path.endswith(SQLITE_SUFFIXES):
+        tenants = load_tenants_sqlite(path)
+    else:
+        tenants = load_tenants_json(path)
+    ids = set()
+    for tenant in tenants:
+        if not all(tenant):
+            raise KeyError(f'Неполная запись в реестре студентов: {tenant.id}')
+        if tenant.id in ids:
+            raise KeyError(f'Повторяется студент в реестре: {tenant.id}')
+        ids.add(tenant.id)
+    return tenants
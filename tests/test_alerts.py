@@ -0,0 +1,55 @@
+import engine
+from alerts import Alerts, fingerprint
+from exceptions import ApiAnswerError
+from utils import MockBot, run_polls
+
+
+class TestAlerts:
+
+    def test_alternating_errors_suppressed(self):
+        alerts = Alerts(window=3600, digest_interval=3600)
+        sent = [
+            alerts.should_send(message, now=minute * 60)
+            for minute, message in enumerate(
+                ['таймаут', 'ошибка 500', 'таймаут', 'ошибка 502'] * 3
+            )
+        ]
+        assert sent.count(True) == 2, (
+            'Чередующиеся ошибки не должны отправляться каждый цикл'
+        )
+
+    def test_window_expires(self):
+        alerts = Alerts(window=60)
+        assert alerts.should_send('таймаут', now=0)
+        assert not alerts.should_send('таймаут', now=30)
+        assert alerts.should_send('таймаут', now=60)
+
+    def test_fingerprint_ignores_numbers(self):
+        assert fingerprint('ошибка 500') == fingerprint('ошибка 502')
+
+    def test_digest(self):
+        alerts = Alerts(window=3600, digest_interval=3600)
+        for second in range(5):
+            alerts.should_send('таймаут', now=second)
+        assert alerts.digest(now=100) is None, 'Сводка раньше срока не нужна'
+        digest = alerts.digest(now=3600)
+        assert '4 × таймаут' in digest
+        assert alerts.digest(now=7200) is None, (
+            'Без новых повторов сводка не отправляется'
+        )
+
+
+class TestEngineAlerts:
+
+    def test_alternating_errors_sent_once(self, monkeypatch):
+        errors = [ApiAnswerError('таймаут'), ApiAnswerError('ошибка 500')] * 2
+
+        async def failing_fetch(*args):
+            raise errors.pop(0)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', failing_fetch)
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 4)
+        assert len(bot.messages) == 2, (
+            'Каждый вид ошибки должен отправляться один раз за окно'
+        )
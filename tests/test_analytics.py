@@ -0,0 +1,132 @@
+import numpy as np
+
+import homework
+from analytics import (NO_STATS, REVIEW, WAIT, ReviewStats, format_duration,
+                       key_column, project_of)
+from history import History
+from validation import Homework
+
+HOUR = 3600
+
+
+def fill(history, events):
+    for tenant, key, name, status, changed_at in events:
+        history.append(tenant, Homework(key, name, status), changed_at)
+    history.flush()
+
+
+class TestReviewStats:
+
+    def test_project_of(self):
+        assert project_of('student__hw05_final.zip') == 'hw05_final'
+        assert project_of('hw1') == 'hw1'
+        assert project_of('') == 'неизвестно'
+
+    def test_key_column(self):
+        assert key_column(np.array([1, 2], dtype=object)).dtype == np.int64
+        assert key_column(np.array([1, 'hw1'], dtype=object)).tolist() == [
+            '1', 'hw1'
+        ], 'Работы без id группируются по названию'
+
+    def test_stage_percentiles(self, tmp_path):
+        history = History(str(tmp_path / 'history.sqlite3'))
+        fill(history, [
+            ('t1', 1, 'a__hw1.zip', 'submitted', 0),
+            ('t2', 1, 'b__hw1.zip', 'submitted', 0),
+            ('t1', 1, 'a__hw1.zip', 'reviewing', 2 * HOUR),
+            ('t2', 1, 'b__hw1.zip', 'reviewing', 4 * HOUR),
+            ('t1', 1, 'a__hw1.zip', 'rejected', 3 * HOUR),
+            ('t2', 1, 'b__hw1.zip', 'approved', 7 * HOUR),
+            ('t1', 2, 'a__hw2.zip', 'reviewing', 10 * HOUR),
+            ('t1', 2, 'a__hw2.zip', 'approved', 15 * HOUR),
+        ])
+        stats = ReviewStats(history)
+        assert stats.refresh() == 5
+        result = stats.stats()
+        assert result[WAIT]['all'].count == 2
+        assert result[WAIT]['all'].percentiles[0] == 3 * HOUR, (
+            'Медиана ожидания — между 2 и 4 часами'
+        )
+        assert sorted(result[REVIEW]['projects']) == ['hw1', 'hw2']
+        assert result[REVIEW]['projects']['hw2'].percentiles[0] == 5 * HOUR
+        assert sorted(result[REVIEW]['hours']) == [2, 4, 10], (
+            'Час замера — час начала этапа'
+        )
+
+    def test_incremental_refresh(self, tmp_path):
+        history = History(str(tmp_path / 'history.sqlite3'))
+        fill(history, [('t1', 1, 'hw1', 'reviewing', 0)])
+        stats = ReviewStats(history, refresh_interval=10)
+        assert stats.refresh(now=0) == 0
+        assert stats.render(stats.stats()) == NO_STATS
+        fill(history, [('t1', 1, 'hw1', 'approved', HOUR)])
+        assert stats.refresh(now=5) == 0, (
+            'Журнал перечитывается не чаще refresh_interval'
+        )
+        assert stats.refresh(now=10) == 1, (
+            'Новая запись продолжает работу из прошлого чтения'
+        )
+        report = stats.report()
+        assert 'p50 1.0 ч' in report and 'hw1' in report
+        assert stats.report() is report, 'Отчёт берётся из кэша'
+
+    def test_restart_from_cache(self, tmp_path):
+        path = str(tmp_path / 'history.sqlite3')
+        history = History(path)
+        fill(history, [
+            ('t1', 1, 'a__hw1.zip', 'submitted', 0),
+            ('t1', 1, 'a__hw1.zip', 'reviewing', HOUR),
+        ])
+        assert ReviewStats(history).refresh() == 1
+        fill(history, [('t1', 1, 'a__hw1.zip', 'approved', 3 * HOUR)])
+        stats = ReviewStats(history)
+        assert stats.refresh() == 1, (
+            'После перезапуска дочитываются только новые записи'
+        )
+        result = stats.stats()
+        assert result[WAIT]['all'].count == 1
+        assert result[REVIEW]['projects']['hw1'].percentiles[0] == 2 * HOUR, (
+            'Незавершённая работа продолжается из сохранённых столбцов'
+        )
+
+    def test_cache_of_other_history_ignored(self, tmp_path):
+        path = str(tmp_path / 'history.sqlite3')
+        history = History(path)
+        fill(history, [('t1', 1, 'hw1', 'reviewing', 0)] * 3)
+        ReviewStats(history).refresh()
+        history.close()
+        (tmp_path / 'history.sqlite3').unlink()
+        history = History(path)
+        fill(history, [
+            ('t1', 1, 'hw1', 'reviewing', 0),
+            ('t1', 1, 'hw1', 'approved', HOUR),
+        ])
+        assert ReviewStats(history).refresh() == 1, (
+            'Кэш, который новее журнала, не используется'
+        )
+
+    def test_format_duration(self):
+        assert format_duration(90) == '2 мин'
+        assert format_duration(5 * HOUR) == '5.0 ч'
+        assert format_duration(72 * HOUR) == '3.0 дн'
+
+
+class TestStatsCommand:
+
+    def test_parse_args(self):
+        args = homework.parse_args(['stats', '--history-db', 'h.sqlite3'])
+        assert (args.command, args.history_db) == ('stats', 'h.sqlite3')
+        assert homework.parse_args([]).command is None
+
+    def test_main_prints_report(self, tmp_path, capsys):
+        path = str(tmp_path / 'history.sqlite3')
+        history = History(path)
+        fill(history, [
+            ('t1', 1, 'hw1', 'reviewing', 0),
+            ('t1', 1, 'hw1', 'approved', HOUR),
+        ])
+        history.close()
+        homework.main(['stats', '--history-db', path])
+        assert 'Ревью' in capsys.readouterr().out, (
+            'Подкоманда stats печатает отчёт без запуска бота'
+        )
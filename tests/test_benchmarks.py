@@ -0,0 +1,32 @@
+from benchmarks.suite import CHAT_ID_BASE, notification_latencies
+from homework import HOMEWORK_VERDICTS
+
+
+class TestNotificationLatencies:
+
+    def test_first_matching_message_after_change(self):
+        text = f'Изменился статус проверки работы "hw0-1". ' \
+            f'{HOMEWORK_VERDICTS["approved"]}'
+        changes = [{'token': 'token-0', 'homework_name': 'hw0-1',
+                    'status': 'approved', 'time': 10.0}]
+        messages = [
+            {'chat_id': str(CHAT_ID_BASE), 'text': text, 'time': 9.0},
+            {'chat_id': str(CHAT_ID_BASE), 'text': text, 'time': 10.5},
+            {'chat_id': str(CHAT_ID_BASE), 'text': text, 'time': 12.0},
+        ]
+        assert notification_latencies(changes, messages) == [0.5], (
+            'Задержка считается до первого уведомления после изменения'
+        )
+
+    def test_change_inside_combined_message(self):
+        text = (
+            'Изменились статусы проверки работ:\n'
+            f'— "hw0-1": {HOMEWORK_VERDICTS["approved"]}\n'
+            f'— "hw0-2": {HOMEWORK_VERDICTS["rejected"]}'
+        )
+        changes = [{'token': 'token-0', 'homework_name': 'hw0-1',
+                    'status': 'approved', 'time': 10.0}]
+        messages = [{'chat_id': str(CHAT_ID_BASE), 'text': text, 'time': 11.0}]
+        assert notification_latencies(changes, messages) == [1.0], (
+            'Изменение находится и в общем сообщении по нескольким работам'
+        )
@@ -0,0 +1,122 @@
+import asyncio
+import functools
+
+import engine
+import metrics
+import retry
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exceptions import ApiAnswerError, ApiUnavailableError
+from utils import MockBot, run_polls
+
+
+class TestCircuitBreaker:
+
+    def make_breaker(self):
+        return CircuitBreaker(
+            window=4, min_calls=4, failure_rate=0.5, slow_call=1,
+            open_time=10, probes=1
+        )
+
+    def test_opens_on_failure_rate(self):
+        breaker = self.make_breaker()
+        for success in (True, False, True):
+            breaker.record(success, now=0)
+        assert breaker.state == CLOSED, (
+            'До min_calls запросов цепь не размыкается'
+        )
+        breaker.record(False, now=0)
+        assert breaker.state == OPEN
+        assert not breaker.allow(now=5), 'Пока цепь разомкнута, запросов нет'
+
+    def test_slow_calls_are_failures(self):
+        breaker = self.make_breaker()
+        for _ in range(4):
+            breaker.record(True, duration=2, now=0)
+        assert breaker.state == OPEN, (
+            'Слишком медленные ответы должны размыкать цепь'
+        )
+
+    def test_half_open_probe(self):
+        breaker = self.make_breaker()
+        breaker.open(now=0)
+        assert breaker.allow(now=10)
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(now=10), (
+            'В пробном режиме пропускается только probes запросов'
+        )
+        breaker.record(False, now=11)
+        assert breaker.state == OPEN, 'Неудачная проба снова размыкает цепь'
+        assert breaker.allow(now=21)
+        breaker.record(True, now=21)
+        assert breaker.state == CLOSED, 'Удачная проба замыкает цепь'
+
+
+class TestEngineBreaker:
+
+    def test_one_outage_notice(self, monkeypatch):
+        calls = []
+
+        async def failing_fetch(*args):
+            calls.append(args)
+            raise ApiUnavailableError('сбой')
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', failing_fetch)
+        monkeypatch.setattr(engine, 'with_retries', functools.partial(
+            retry.with_retries, retries=0
+        ))
+        errors = metrics.ERRORS.total()
+        breaker = CircuitBreaker(
+            window=2, min_calls=2, failure_rate=1, open_time=60
+        )
+        bot = MockBot()
+        run_polls(
+            bot, [engine.PollJob('default', 'token', 1)], 5, breaker=breaker
+        )
+        assert len(calls) == 2, (
+            'При разомкнутой цепи опрос не должен обращаться к API'
+        )
+        assert bot.texts.count(engine.OUTAGE_MESSAGE) == 1, (
+            'Студент должен получить одно сообщение о недоступности API'
+        )
+        assert metrics.ERRORS.total() - errors == 2, (
+            'Ошибка, вызвавшая размыкание, учитывается в метриках'
+        )
+
+    def test_tenant_errors_keep_breaker_closed(self, monkeypatch):
+        async def rejected_fetch(*args):
+            raise ApiAnswerError('Ошибка при запросе к основному API.')
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', rejected_fetch)
+        breaker = CircuitBreaker(
+            window=2, min_calls=2, failure_rate=1, open_time=60
+        )
+        jobs = [engine.PollJob(str(number), 'bad', number)
+                for number in range(3)]
+        bot = MockBot()
+        run_polls(bot, jobs, 2, breaker=breaker)
+        assert breaker.state == CLOSED, (
+            'Ошибки отдельных токенов не размыкают цепь для всех'
+        )
+        assert engine.OUTAGE_MESSAGE not in bot.texts
+
+    def test_probe_answered_from_cache_is_released(self, monkeypatch):
+        async def answer(*args):
+            return {'homeworks': [], 'current_date': 1}
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', answer)
+        breaker = CircuitBreaker(open_time=0, probes=1)
+        first = engine.PollJob('1', 'token', 1)
+        second = engine.PollJob('2', 'token', 2)
+
+        async def inner():
+            eng = engine.Engine(None, [], breaker=breaker)
+            await eng.fetch(first, 100)
+            breaker.open(now=0)
+            assert breaker.allow()
+            # То же окно того же токена: ответ берётся из кэша.
+            await eng.fetch(second, 100, probe=True, cached=True)
+
+        asyncio.run(inner())
+        assert breaker.state == HALF_OPEN and breaker.in_flight == 0, (
+            'Проба без запроса к API должна освободить своё место'
+        )
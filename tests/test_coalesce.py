@@ -0,0 +1,133 @@
+import asyncio
+
+import engine
+from coalesce import Coalescer, render
+from diff import StatusChange
+from utils import MockBot, run_polls
+from validation import Homework
+
+
+def change(key, old, new):
+    return StatusChange(Homework(key, f'hw{key}', new), old, new)
+
+
+class TestRender:
+
+    def test_single_change_as_before(self):
+        message, errors = render([change(1, 'reviewing', 'approved')])
+        assert message.startswith('Изменился статус проверки работы "hw1"')
+        assert errors == []
+
+    def test_several_changes_in_one_message(self):
+        message, _ = render([
+            change(1, 'reviewing', 'approved'),
+            change(2, None, 'reviewing'),
+        ])
+        assert '"hw1"' in message and '"hw2"' in message
+
+    def test_unknown_status_reported(self):
+        message, errors = render([
+            change(1, 'reviewing', 'approved'), change(2, None, 'странный'),
+        ])
+        assert message.startswith('Изменился статус проверки работы "hw1"')
+        assert len(errors) == 1
+
+
+class TestCoalescer:
+
+    def test_hold_window_merges_transitions(self):
+        flushed = []
+        job = engine.PollJob('t1', 'token', 5)
+
+        async def inner():
+            coalescer = Coalescer(
+                lambda job, changes, staged: flushed.append(changes), hold=0.02
+            )
+            coalescer.add(job, [change(1, None, 'reviewing')])
+            coalescer.add(job, [change(1, 'reviewing', 'rejected')])
+            assert flushed == [], 'До конца окна уведомление не отправляется'
+            await asyncio.sleep(0.05)
+
+        asyncio.run(inner())
+        assert len(flushed) == 1
+        (merged,) = flushed[0]
+        assert (merged.old_status, merged.new_status) == (None, 'rejected'), (
+            'Переходы одной работы в окне сводятся к одному'
+        )
+
+    def test_flapping_dropped(self):
+        flushed = []
+        job = engine.PollJob('t1', 'token', 5)
+
+        async def inner():
+            coalescer = Coalescer(
+                lambda job, changes, staged: flushed.append(changes), hold=60
+            )
+            coalescer.add(job, [change(1, 'reviewing', 'rejected')])
+            coalescer.add(job, [change(1, 'rejected', 'reviewing')])
+            coalescer.release_all()
+
+        asyncio.run(inner())
+        assert flushed == [], 'Вернувшийся статус не требует уведомления'
+
+    def test_held_change_survives_restart(self, monkeypatch, tmp_path):
+        from storage import Store
+
+        reviewing = {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}
+        answers = [
+            {'homeworks': [reviewing], 'current_date': 1},
+            {'homeworks': [dict(reviewing, status='approved')],
+             'current_date': 2},
+            {'homeworks': [], 'current_date': 3},
+        ]
+
+        async def mock_fetch(session, token, timestamp, *args):
+            return answers.pop(0)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+        store, bot = Store(str(tmp_path / 'state.sqlite3')), MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 2,
+                  store=store, notify_hold=60)
+        held = store.load('default').pending
+        assert bot.messages == [] and len(held) == 1, (
+            'Отложенное уведомление сохраняется вместе со статусом'
+        )
+        assert '"hw1"' in held[0][1]
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 1,
+                  store=store)
+        assert len(bot.messages) == 1, (
+            'После перезапуска отложенное уведомление отправляется'
+        )
+        assert store.load('default').pending == []
+
+    def test_release_replaces_held_notification(self, monkeypatch, tmp_path):
+        from storage import Store
+
+        reviewing = {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}
+        answers = [
+            {'homeworks': [reviewing], 'current_date': 1},
+            {'homeworks': [dict(reviewing, status='approved')],
+             'current_date': 2},
+        ]
+
+        async def mock_fetch(session, token, timestamp, *args):
+            return answers.pop(0)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+        store, bot = Store(str(tmp_path / 'state.sqlite3')), MockBot()
+        eng = run_polls(bot, [engine.PollJob('default', 'token', 1)], 2,
+                        store=store, notify_hold=60)
+
+        async def release():
+            eng.sender.start()
+            eng.coalescer.release_all()
+            await eng.outbox.drain()
+            await eng.sender.join()
+            await eng.flush_state()
+            await eng.sender.stop()
+
+        asyncio.run(release())
+        assert len(bot.messages) == 1
+        assert store.load('default').pending == [], (
+            'Общее уведомление заменяет сохранённое'
+        )
@@ -0,0 +1,88 @@
+from cache import TTLCache
+from commands import NO_DATA, CommandServer, StatusCache, split_text
+from diff import StatusChange
+from validation import Homework
+
+
+class Message:
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_text(self, text):
+        self.replies.append(text)
+
+
+class Update:
+
+    def __init__(self, chat_id):
+        self.effective_chat = type('Chat', (), {'id': chat_id})
+        self.effective_message = Message()
+
+
+class TestStatusCache:
+
+    def test_merge_incremental_answers(self):
+        cache = StatusCache()
+        cache.update('12', [
+            Homework(1, 'hw1', 'reviewing'),
+            Homework(2, 'hw2', 'approved'),
+        ])
+        cache.update(12, [
+            Homework(1, 'hw1', 'rejected'),
+        ])
+        text = cache.status_text(12)
+        assert 'у ревьюера есть замечания' in text
+        assert 'hw2' in text, (
+            'Пустые и частичные ответы не должны стирать известные работы'
+        )
+
+    def test_expired_cache(self):
+        cache = StatusCache(ttl=0)
+        cache.update(1, [Homework(1, 'hw', 'x')])
+        assert cache.status_text(1) == NO_DATA
+
+    def test_commands_answer_from_cache(self):
+        cache = StatusCache()
+        cache.record(5, StatusChange(
+            Homework(1, 'hw1', 'approved'), 'reviewing', 'approved'
+        ))
+        server = CommandServer(bot=None, cache=cache)
+        update = Update(5)
+        server.history(update, None)
+        assert 'reviewing → approved' in update.effective_message.replies[0]
+        update = Update(6)
+        server.status(update, None)
+        assert update.effective_message.replies == [NO_DATA]
+
+
+class TestTTLCache:
+
+    def test_get_set(self):
+        cache = TTLCache(ttl=60)
+        cache.set('key', 1)
+        assert cache.get('key') == 1
+        assert cache.get('other', 0) == 0
+
+    def test_prune(self):
+        cache = TTLCache(ttl=0)
+        cache.set('key', 1)
+        cache.prune()
+        assert len(cache) == 0
+
+
+class TestStats:
+
+    def test_split_text(self):
+        assert split_text('a\nb\nc', limit=3) == ['a\nb', 'c']
+        assert split_text('короткий') == ['короткий']
+
+    def test_stats_command(self):
+        class Stats:
+            def report(self):
+                return 'отчёт'
+
+        server = CommandServer(bot=None, cache=StatusCache(), stats=Stats())
+        update = Update(5)
+        server.review_stats(update, None)
+        assert update.effective_message.replies == ['отчёт']
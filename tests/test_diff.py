@@ -0,0 +1,33 @@
+from diff import HomeworkDiff
+from validation import Homework
+
+
+class TestHomeworkDiff:
+
+    def test_only_changed_homeworks(self):
+        diff = HomeworkDiff()
+        diff.apply([
+            Homework(2, 'hw2', 'reviewing'),
+            Homework(1, 'hw1', 'reviewing'),
+        ])
+        changes = diff.apply([
+            Homework(2, 'hw2', 'reviewing'),
+            Homework(1, 'hw1', 'approved'),
+        ])
+        assert [change.homework.id for change in changes] == [1], (
+            'Изменение должно находиться для любой работы, не только первой'
+        )
+        assert changes[0].old_status == 'reviewing'
+        assert changes[0].new_status == 'approved'
+
+    def test_changes_in_chronological_order(self):
+        diff = HomeworkDiff()
+        changes = diff.apply([
+            Homework(2, 'hw2', 'reviewing'),
+            Homework(1, 'hw1', 'approved'),
+        ])
+        assert [change.homework.id for change in changes] == [1, 2]
+
+    def test_missing_id_uses_name(self):
+        diff = HomeworkDiff({'hw1': 'approved'})
+        assert diff.apply([Homework(None, 'hw1', 'approved')]) == []
@@ -0,0 +1,246 @@
+import asyncio
+
+import engine
+from exceptions import ApiAnswerError
+from utils import MockBot, run_polls
+
+
+def make_answers(*answers):
+    answers = list(answers)
+
+    async def mock_fetch(session, token, timestamp, *args):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    return mock_fetch
+
+
+class TestEngine:
+    HOMEWORK = {'homework_name': 'hw1', 'status': 'reviewing'}
+
+    def test_first_poll_is_baseline(self, monkeypatch):
+        answer = {'homeworks': [self.HOMEWORK], 'current_date': 1}
+        monkeypatch.setattr(
+            engine, 'fetch_api_answer', make_answers(answer, answer)
+        )
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 2)
+        assert bot.messages == [], (
+            'Первый ответ API не должен приводить к уведомлению'
+        )
+
+    def test_status_change_is_sent(self, monkeypatch):
+        approved = dict(self.HOMEWORK, status='approved')
+        monkeypatch.setattr(engine, 'fetch_api_answer', make_answers(
+            {'homeworks': [self.HOMEWORK], 'current_date': 1},
+            {'homeworks': [approved], 'current_date': 2},
+        ))
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 7)], 2)
+        assert len(bot.messages) == 1
+        chat_id, text = bot.messages[0]
+        assert chat_id == 7, 'Сообщение должно уйти в чат задачи'
+        assert text.endswith('ревьюеру всё понравилось. Ура!')
+
+    def test_same_error_sent_once(self, monkeypatch):
+        monkeypatch.setattr(engine, 'fetch_api_answer', make_answers(
+            ApiAnswerError('сбой'), ApiAnswerError('сбой')
+        ))
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 2)
+        assert len(bot.messages) == 1, (
+            'Одинаковая ошибка должна отправляться только один раз'
+        )
+
+    def test_cursor_follows_current_date(self, monkeypatch):
+        timestamps = []
+        answers = make_answers(
+            {'homeworks': [self.HOMEWORK], 'current_date': 5000},
+            {'homeworks': [], 'current_date': 5600},
+        )
+
+        async def mock_fetch(session, token, timestamp, *args):
+            timestamps.append(timestamp)
+            return await answers(session, token, timestamp)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+        job = engine.PollJob('default', 'token', 1)
+        run_polls(MockBot(), [job], 2)
+        assert timestamps[1] == 5000 - engine.CURSOR_OVERLAP, (
+            'Следующий запрос должен начинаться от current_date ответа'
+        )
+        assert job.cursor == 5000 - engine.CURSOR_OVERLAP, (
+            'Пока обновлений нет, курсор должен стоять на месте'
+        )
+
+    def test_scheduled_poll_skips_answer_cache(self, monkeypatch):
+        approved = dict(self.HOMEWORK, status='approved')
+        monkeypatch.setattr(engine, 'fetch_api_answer', make_answers(
+            {'homeworks': [self.HOMEWORK], 'current_date': 1},
+            {'homeworks': [], 'current_date': 1},
+            {'homeworks': [approved], 'current_date': 1},
+        ))
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 3)
+        assert len(bot.messages) == 1, (
+            'Повторный опрос того же окна должен доходить до API'
+        )
+
+    def test_resync_after_interval(self):
+        job = engine.PollJob('default', 'token', 1)
+        job.advance(5000, True, 5000)
+        assert job.window_start(5100) == 5000 - engine.CURSOR_OVERLAP
+        now = 5000 + engine.RESYNC_INTERVAL
+        assert job.window_start(now) == now - engine.ONE_MONTH_IN_SEC, (
+            'По истечении RESYNC_INTERVAL нужен запрос за полный месяц'
+        )
+
+    def test_every_changed_homework_is_sent(self, monkeypatch):
+        fetches = []
+        answers = make_answers(
+            {'homeworks': [
+                {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+            ], 'current_date': 1},
+            {'homeworks': [
+                {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            ], 'current_date': 2},
+        )
+
+        async def mock_fetch(*args):
+            fetches.append(args)
+            return await answers(*args)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 2)
+        assert len(fetches) == 2, 'На один цикл должен приходиться один запрос'
+        assert len(bot.messages) == 1, (
+            'Изменения одного цикла должны уходить одним сообщением'
+        )
+        assert bot.messages[0][1].split('"')[1::2] == ['hw1', 'hw2'], (
+            'В сообщении нужна каждая изменившаяся работа'
+        )
+
+    def test_restart_resumes_from_cursor(self, monkeypatch, tmp_path):
+        from storage import Store
+
+        path = str(tmp_path / 'state.sqlite3')
+        timestamps = []
+        answers = make_answers(
+            {'homeworks': [{'id': 1, 'homework_name': 'hw1',
+                            'status': 'reviewing'}], 'current_date': 5000},
+            {'homeworks': [{'id': 1, 'homework_name': 'hw1',
+                            'status': 'approved'}], 'current_date': 5600},
+        )
+
+        async def mock_fetch(session, token, timestamp, *args):
+            timestamps.append(timestamp)
+            return await answers(session, token, timestamp)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+        bot = MockBot()
+        for _ in range(2):
+            store = Store(path)
+            run_polls(bot, [engine.PollJob('default', 'token', 1)], 1,
+                      store=store)
+            store.close()
+        assert timestamps[1] == 5000 - engine.CURSOR_OVERLAP, (
+            'После перезапуска запрос должен идти от сохранённого курсора'
+        )
+        assert len(bot.messages) == 1, (
+            'После перезапуска изменение должно сравниваться с сохранённым'
+        )
+
+    def test_restart_keeps_changed_at(self, monkeypatch, tmp_path):
+        from storage import Store
+
+        path = str(tmp_path / 'state.sqlite3')
+        store = Store(path)
+        store.save_cursor('default', 100, 0, '', 1000)
+        store.flush()
+        store.close()
+        monkeypatch.setattr(engine, 'fetch_api_answer', make_answers(
+            {'homeworks': [], 'current_date': 200}
+        ))
+        store = Store(path)
+        job = engine.PollJob('default', 'token', 1)
+        run_polls(MockBot(), [job], 1, store=store)
+        store.close()
+        assert job.changed_at == 1000, (
+            'После перезапуска студент без изменений не должен '
+            'считаться только что изменившимся'
+        )
+        assert Store(path).load('default').changed_at == 1000
+
+    def test_failed_load_is_retried(self, monkeypatch, tmp_path):
+        import sqlite3
+        import time
+
+        from storage import Store
+
+        store = Store(str(tmp_path / 'state.sqlite3'))
+        store.save_cursor('default', 100, time.time(), '')
+        store.save_status('default', 1, 'reviewing', 'hw1')
+        store.add_pending('default', 'неотправленное')
+        store.flush()
+        load = store.load
+        failures = [sqlite3.OperationalError('database is locked')]
+
+        def flaky_load(tenant_id):
+            if failures:
+                raise failures.pop()
+            return load(tenant_id)
+
+        store.load = flaky_load
+        timestamps = []
+        answers = make_answers({'homeworks': [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+        ], 'current_date': 200})
+
+        async def mock_fetch(session, token, timestamp, *args):
+            timestamps.append(timestamp)
+            return await answers(session, token, timestamp)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+        bot = MockBot()
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 2,
+                  store=store)
+        assert timestamps == [100], (
+            'После сбоя загрузки опрос идёт от сохранённого курсора'
+        )
+        assert bot.texts[0] == 'неотправленное'
+        assert bot.texts[1].endswith('ревьюеру всё понравилось. Ура!'), (
+            'Смена сохранённого статуса должна дать уведомление'
+        )
+
+    def test_failed_notification_is_retried(self, monkeypatch):
+        import outbox
+        import sender
+
+        monkeypatch.setattr(sender, 'SEND_RETRIES', 1)
+        monkeypatch.setattr(outbox, 'OUTBOX_BACKOFF', 0)
+        reviewing = {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}
+        approved = dict(reviewing, status='approved')
+        monkeypatch.setattr(engine, 'fetch_api_answer', make_answers(
+            {'homeworks': [reviewing], 'current_date': 1},
+            {'homeworks': [approved], 'current_date': 2},
+            {'homeworks': [], 'current_date': 3},
+        ))
+        bot = MockBot()
+        original_send = bot.send_message
+        failures = [Exception('сбой')]
+
+        def flaky_send(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return original_send(*args, **kwargs)
+
+        bot.send_message = flaky_send
+        run_polls(bot, [engine.PollJob('default', 'token', 1)], 3)
+        assert len(bot.messages) == 1, (
+            'Неотправленное уведомление нужно повторить при следующем опросе'
+        )
@@ -0,0 +1,120 @@
+import asyncio
+import os
+
+import engine
+from history import History
+from validation import Homework
+
+
+def homework(key, status, name='hw'):
+    return Homework(key, name, status)
+
+
+class TestHistory:
+
+    def test_connection_is_lazy(self, tmp_path):
+        path = str(tmp_path / 'history.sqlite3')
+        History(path)
+        assert not os.path.exists(path), (
+            'База истории должна открываться только при первом обращении'
+        )
+
+    def test_lookup_by_tenant_and_homework(self, tmp_path):
+        history = History(str(tmp_path / 'history.sqlite3'))
+        history.append('t1', homework(1, 'reviewing'), 100, observed_at=10)
+        history.append('t2', homework(1, 'reviewing'), 100, observed_at=11)
+        history.append('t1', homework(2, 'reviewing'), None, observed_at=12)
+        history.append('t1', homework(1, 'approved'), 200, observed_at=13)
+        history.flush()
+
+        assert [
+            (event.homework_key, event.status)
+            for event in history.for_tenant('t1')
+        ] == [(1, 'reviewing'), (2, 'reviewing'), (1, 'approved')]
+        assert [
+            event.status for event in history.for_homework(1, 't1')
+        ] == ['reviewing', 'approved']
+        assert len(history.for_homework(1)) == 3
+        assert [
+            event.observed_at for event in history.for_tenant('t1', since=12)
+        ] == [12, 13], 'since отсекает более ранние записи'
+        assert history.for_homework(2)[0].changed_at is None
+
+    def test_lookups_use_indexes(self, tmp_path):
+        connection = History(str(tmp_path / 'history.sqlite3')).connection
+        for query, params in (
+            ('WHERE tenant_id = ? AND observed_at >= ?', ('t1', 0)),
+            ('WHERE homework_key = ? AND tenant_id = ?', (1, 't1')),
+            ('WHERE homework_key = ?', (1,)),
+        ):
+            plan = ' '.join(
+                row[-1] for row in connection.execute(
+                    f'EXPLAIN QUERY PLAN SELECT * FROM transitions {query}',
+                    params
+                )
+            )
+            assert 'USING INDEX' in plan, (
+                f'Поиск {query} должен идти по индексу, план: {plan}'
+            )
+
+    def test_compact_drops_expired_and_repeated(self, tmp_path):
+        day = 24 * 60 * 60
+        history = History(str(tmp_path / 'history.sqlite3'), retention_days=30)
+        now = 100 * day
+        for observed_at, key, status in (
+            (now - 40 * day, 1, 'reviewing'),
+            (now - 20 * day, 1, 'reviewing'),
+            (now - 10 * day, 1, 'approved'),
+            (now - 9 * day, 1, 'approved'),
+            (now - 8 * day, 2, 'approved'),
+            (now - 7 * day, 2, 'rejected'),
+            (now - 6 * day, 2, 'approved'),
+        ):
+            history.append('t1', homework(key, status), None, observed_at)
+        history.flush()
+
+        assert history.compact(now) == 2, (
+            'Сжатие удаляет записи старше срока и повторы статуса'
+        )
+        assert [
+            event.status for event in history.for_homework(1)
+        ] == ['reviewing', 'approved']
+        assert [
+            event.status for event in history.for_homework(2)
+        ] == ['approved', 'rejected', 'approved'], (
+            'Возврат к прежнему статусу — это новая смена, а не повтор'
+        )
+
+    def test_engine_records_transitions(self, monkeypatch, tmp_path):
+        history = History(str(tmp_path / 'history.sqlite3'))
+        reviewing = {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing',
+                     'date_updated': '2022-05-01T10:00:00Z'}
+        answers = [
+            {'homeworks': [reviewing], 'current_date': 1},
+            {'homeworks': [dict(reviewing, status='approved')],
+             'current_date': 2},
+            {'homeworks': [], 'current_date': 3},
+        ]
+
+        async def mock_fetch(session, token, timestamp, *args):
+            return answers.pop(0)
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', mock_fetch)
+
+        async def inner():
+            eng = engine.Engine(None, [], history=history)
+            eng.coalescer.flush = lambda job, changes, staged: None
+            job = engine.PollJob('t1', 'token', 1)
+            for _ in range(3):
+                await eng.poll(job)
+            eng.coalescer.release_all()
+            await eng.flush_state()
+
+        asyncio.run(inner())
+        events = history.for_tenant('t1')
+        assert [event.status for event in events] == [
+            'reviewing', 'approved'
+        ], 'В журнал попадает и первый увиденный статус, и его смена'
+        assert events[0].changed_at == engine.parse_api_date(
+            reviewing['date_updated']
+        )
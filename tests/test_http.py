@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import engine
+from benchmarks.fake_practicum import make_app, start_server
+from exceptions import ApiTimeoutError
+
+
+def fetch_twice(timestamps):
+    async def inner():
+        runner, url = await start_server(make_app())
+        validators = {}
+        try:
+            async with engine.make_session() as session:
+                return [
+                    await engine.fetch_api_answer(
+                        session, 'token', timestamp, validators, url
+                    )
+                    for timestamp in timestamps
+                ]
+        finally:
+            await runner.cleanup()
+    return asyncio.run(inner())
+
+
+class TestConditionalRequests:
+
+    def test_repeated_request_is_not_modified(self):
+        first, second = fetch_twice([100, 100])
+        assert first['current_date'] == 100
+        assert second is None, (
+            'На повтор запроса с тем же ETag ожидается 304 и None'
+        )
+
+    def test_new_window_is_fetched(self):
+        first, second = fetch_twice([100, 200])
+        assert second['current_date'] == 200, (
+            'Заголовки условного запроса нельзя слать для другого окна'
+        )
+
+
+class TestTimeouts:
+
+    def test_read_timeout_is_typed(self, monkeypatch):
+        async def hanging(request):
+            await asyncio.sleep(1)
+            return web.json_response({})
+
+        monkeypatch.setattr(engine, 'API_READ_TIMEOUT', 0.05)
+        monkeypatch.setattr(engine, 'API_CONNECT_TIMEOUT', 0.05)
+        app = web.Application()
+        app.router.add_get('/', hanging)
+
+        async def inner():
+            runner, url = await start_server(app, path='/')
+            try:
+                async with engine.make_session() as session:
+                    await engine.fetch_api_answer(session, 'token', 0, None, url)
+            finally:
+                await runner.cleanup()
+
+        with pytest.raises(ApiTimeoutError):
+            asyncio.run(inner())
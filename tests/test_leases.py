@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import engine
+from leases import LeaseManager, SqliteLeases
+
+
+def make_manager(path, owner, buckets=8, ttl=30):
+    return LeaseManager(SqliteLeases(path), owner, buckets=buckets, ttl=ttl)
+
+
+class TestLeases:
+
+    def test_acquire_is_exclusive(self, tmp_path):
+        backend = SqliteLeases(str(tmp_path / 'leases.sqlite3'))
+        assert backend.acquire('a', 'node1', 30, 0)
+        assert not backend.acquire('a', 'node2', 30, 10), (
+            'Чужую действующую аренду брать нельзя'
+        )
+        assert backend.acquire('a', 'node1', 30, 10), (
+            'Владелец должен продлевать свою аренду'
+        )
+        assert backend.acquire('a', 'node2', 30, 41), (
+            'Истёкшую аренду может взять другой узел'
+        )
+
+    def test_nodes_split_buckets(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        first, second = make_manager(path, 'a'), make_manager(path, 'b')
+        first.refresh(now=0)
+        assert len(first.owned) == 8, 'Единственный узел берёт все корзины'
+        second.refresh(now=1)
+        first.refresh(now=2)
+        second.refresh(now=3)
+        assert len(first.owned) == len(second.owned) == 4, (
+            'Корзины должны делиться между живыми узлами поровну'
+        )
+        assert not first.owned & second.owned, (
+            'Корзину не должны опрашивать два узла'
+        )
+
+    def test_failover_after_expiry(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        first, second = make_manager(path, 'a'), make_manager(path, 'b')
+        first.refresh(now=0)
+        second.refresh(now=1)
+        assert second.owned == set()
+        gained = second.refresh(now=31)
+        assert len(gained) == 8, (
+            'После истечения аренд упавшего узла их забирает живой'
+        )
+
+    def test_stops_polling_when_renewal_fails(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        first = make_manager(path, 'a')
+        second = make_manager(path, 'b')
+        first.margin = 5
+        first.refresh(now=0)
+        tenant = '1'
+        assert first.owns(tenant, now=20)
+        # Узел a перестал продлевать аренды, например база заблокирована.
+        assert not first.owns(tenant, now=25), (
+            'Узел должен перестать опрашивать до истечения аренды'
+        )
+        second.refresh(now=31)
+        assert second.owns(tenant, now=31), (
+            'После истечения аренды корзину забирает другой узел'
+        )
+        assert not first.owns(tenant, now=31), (
+            'Корзину не должны опрашивать два узла'
+        )
+        bucket = first.bucket_for(tenant)
+        second.release_all()
+        assert bucket in first.refresh(now=40), (
+            'Корзину после просроченной аренды нужно перечитать, как новую'
+        )
+
+    def test_release_all(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        first, second = make_manager(path, 'a'), make_manager(path, 'b')
+        first.refresh(now=0)
+        first.release_all()
+        second.refresh(now=1)
+        assert len(second.owned) == 8
+
+
+class TestEngineLeases:
+
+    def test_skips_foreign_tenants(self, monkeypatch, tmp_path):
+        polled = []
+
+        async def mock_poll(job):
+            polled.append(job.tenant_id)
+
+        leases = make_manager(str(tmp_path / 'leases.sqlite3'), 'a')
+        jobs = [engine.PollJob(str(number), 'token', 1) for number in range(20)]
+        eng = engine.Engine(None, jobs, leases=leases)
+        monkeypatch.setattr(eng, 'poll', mock_poll)
+        leases.owned = {0}
+        leases.expires = {0: time.time() + 60}
+
+        async def inner():
+            for job in jobs:
+                await eng._dispatch(job)
+
+        asyncio.run(inner())
+        assert polled == [
+            job.tenant_id for job in jobs if leases.bucket_for(job.tenant_id) == 0
+        ], 'Опрашивать нужно только студентов из своих корзин'
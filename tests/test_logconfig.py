@@ -0,0 +1,50 @@
+import asyncio
+import io
+import json
+import logging
+
+import logconfig
+
+
+def make_logger(name, **kwargs):
+    stream = io.StringIO()
+    logger = logging.getLogger(name)
+    listener = logconfig.setup_logging(
+        logger, logging.Formatter('%(message)s'), stream=stream, **kwargs
+    )
+    return logger, listener, stream
+
+
+class TestLogging:
+
+    def test_json_with_context(self):
+        logger, listener, stream = make_logger(
+            'test_json_with_context', json_output=True
+        )
+
+        async def poll(tenant):
+            logconfig.bind(tenant=tenant, poll=1)
+            logger.info('опрос')
+
+        async def polls():
+            await asyncio.gather(poll('a'), poll('b'))
+
+        asyncio.run(polls())
+        logconfig.stop_listener(listener)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert sorted(record['tenant'] for record in records) == ['a', 'b'], (
+            'Каждая задача asyncio должна писать свои поля контекста'
+        )
+        assert records[0]['message'] == 'опрос'
+
+    def test_debug_sampling(self):
+        logger, listener, stream = make_logger(
+            'test_debug_sampling', sample=10
+        )
+        for _ in range(100):
+            logger.debug('частое сообщение')
+        logger.error('ошибка')
+        logconfig.stop_listener(listener)
+        lines = stream.getvalue().splitlines()
+        assert lines.count('частое сообщение') == 10
+        assert lines.count('ошибка') == 1, 'Ошибки не прореживаются'
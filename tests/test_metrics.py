@@ -0,0 +1,68 @@
+import asyncio
+
+import aiohttp
+
+import metrics
+
+
+class TestMetrics:
+
+    def test_counter_render(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter(
+            'errors_total', 'Ошибки', ['type'], registry=registry
+        )
+        counter.inc(type='ApiAnswerError')
+        counter.inc(2, type='ApiAnswerError')
+        assert 'errors_total{type="ApiAnswerError"} 3' in registry.render()
+        assert '# TYPE errors_total counter' in registry.render()
+
+    def test_histogram_buckets(self):
+        registry = metrics.Registry()
+        histogram = metrics.Histogram(
+            'latency', 'Задержка', buckets=(0.1, 1), registry=registry
+        )
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        text = registry.render()
+        assert 'latency_bucket{le="0.1"} 1' in text
+        assert 'latency_bucket{le="1"} 2' in text
+        assert 'latency_bucket{le="+Inf"} 3' in text, (
+            'Корзины гистограммы должны быть накопительными'
+        )
+        assert 'latency_count 3' in text
+        assert histogram.count() == 3
+
+    def test_gauge_function(self):
+        registry = metrics.Registry()
+        metrics.Gauge('depth', 'Очередь', registry=registry,
+                      function=lambda: 7)
+        assert 'depth 7' in registry.render()
+
+    def test_http_endpoint(self):
+        async def scrape():
+            runner = await metrics.start_server(port=0)
+            port = runner.addresses[0][1]
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(
+                        f'http://127.0.0.1:{port}/metrics'
+                    ) as response:
+                        return await response.text()
+            finally:
+                await runner.cleanup()
+
+        assert 'homework_api_request_seconds' in asyncio.run(scrape())
+
+    def test_error_type_uses_requested_classes(self):
+        from exceptions import (ApiTimeoutError, ResponseKeyError,
+                                ResponseTypeError)
+
+        assert metrics.error_type(ResponseKeyError('homeworks')) == 'KeyError'
+        assert metrics.error_type(
+            ResponseTypeError('homeworks', 'list', 1)
+        ) == 'TypeError'
+        assert metrics.error_type(ApiTimeoutError('долго')) == (
+            'ApiAnswerError'
+        ), 'Уточнённые ошибки считаются по базовому классу'
+        assert metrics.error_type(ValueError()) == 'ValueError'
@@ -0,0 +1,128 @@
+import asyncio
+import sqlite3
+
+import engine
+import outbox
+from outbox import Outbox, retry_delay
+from storage import Store
+
+
+class RecordingSender:
+
+    def __init__(self, path, delivered=True):
+        self.path = path
+        self.delivered = delivered
+        self.rows_at_submit = []
+
+    def submit(self, chat_id, text, callback=None):
+        connection = sqlite3.connect(self.path)
+        self.rows_at_submit.append(
+            connection.execute('SELECT text FROM pending').fetchall()
+        )
+        connection.close()
+        callback(self.delivered)
+        return True
+
+
+class TestOutbox:
+
+    def test_group_commit(self):
+        commits, submitted = [], []
+
+        async def commit():
+            commits.append(len(submitted))
+
+        async def inner():
+            box = Outbox(commit, delay=0.01)
+            for number in range(5):
+                box.stage(lambda number=number: submitted.append(number))
+            await box.drain()
+
+        asyncio.run(inner())
+        assert commits == [0], 'Пачка должна записываться одним коммитом'
+        assert submitted == list(range(5)), (
+            'Отправка начинается только после записи на диск'
+        )
+
+    def test_retry_delay_grows_and_is_capped(self):
+        assert retry_delay(1, backoff=4, limit=100) <= 4
+        assert 8 <= retry_delay(3, backoff=4, limit=100) <= 16
+        assert retry_delay(20, backoff=4, limit=100) <= 100
+
+    def test_written_before_send_and_removed_after_ack(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = Store(path)
+        sender = RecordingSender(path)
+        eng = engine.Engine(None, [], store=store, sender=sender)
+        job = engine.PollJob('t1', 'token', 1)
+
+        async def inner():
+            eng.deliver(job, 'уведомление')
+            await eng.outbox.drain()
+            await eng.flush_state()
+
+        asyncio.run(inner())
+        assert sender.rows_at_submit == [[('уведомление',)]], (
+            'Уведомление должно быть на диске до отправки'
+        )
+        assert store.load('t1').pending == [], (
+            'После подтверждения Телеграма уведомление снимается'
+        )
+        store.close()
+
+    def test_failed_send_survives_restart(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'state.sqlite3')
+        monkeypatch.setattr(outbox, 'OUTBOX_BACKOFF', 60)
+        store = Store(path)
+        eng = engine.Engine(
+            None, [], store=store,
+            sender=RecordingSender(path, delivered=False)
+        )
+        job = engine.PollJob('t1', 'token', 1)
+
+        async def inner():
+            eng.deliver(job, 'уведомление')
+            await eng.outbox.drain()
+            eng.retry_pending(job)
+            await eng.flush_state()
+
+        asyncio.run(inner())
+        assert len(job.pending) == 1 and job.pending[0].attempts == 1
+        assert job.pending[0].retry_at > 0, (
+            'Повтор должен ждать паузу, а не идти сразу'
+        )
+        store.close()
+        assert [text for _, text in Store(path).load('t1').pending] == [
+            'уведомление'
+        ], 'Недоставленное уведомление должно пережить перезапуск'
+
+    def test_failed_commit_is_written_later(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'state.sqlite3')
+        monkeypatch.setattr(outbox, 'OUTBOX_BACKOFF', 60)
+        store = Store(path)
+        store.connection
+        write = store.write
+        failures = [sqlite3.OperationalError('database is locked')]
+
+        def flaky_write(batch):
+            if failures:
+                raise failures.pop()
+            write(batch)
+
+        store.write = flaky_write
+        eng = engine.Engine(
+            None, [], store=store,
+            sender=RecordingSender(path, delivered=False)
+        )
+        job = engine.PollJob('t1', 'token', 1)
+
+        async def inner():
+            eng.deliver(job, 'уведомление')
+            await eng.outbox.drain()
+            await eng.flush_state()
+
+        asyncio.run(inner())
+        store.close()
+        assert [text for _, text in Store(path).load('t1').pending] == [
+            'уведомление'
+        ], 'После сбоя записи уведомление записывается следующей пачкой'
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+from ratelimit import ApiLimiter, KeyedBuckets, PriorityLimiter, TokenBucket
+
+
+class TestTokenBucket:
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        bucket.updated = 0
+        delays = [bucket.reserve(now=0) for _ in range(4)]
+        assert delays == [0, 0, 0.5, 1.0], (
+            'После исчерпания запаса ожидание растёт на 1/rate'
+        )
+
+    def test_refill(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.updated = 0
+        bucket.reserve(now=0)
+        assert bucket.reserve(now=1) == 0
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=1, capacity=5)
+        bucket.updated = 0
+        bucket.pause(3, now=0)
+        assert bucket.reserve(now=0) == 3, (
+            'После паузы токен выдаётся не раньше её окончания'
+        )
+
+    def test_rate_below_one(self):
+        bucket = TokenBucket(rate=0.5, capacity=0.5)
+        bucket.updated = 0
+        assert bucket.wait_time(now=0) == 0, (
+            'При частоте меньше 1 в секунду токен всё равно выдаётся'
+        )
+        bucket.reserve(now=0)
+        assert bucket.wait_time(now=0) == 2
+
+    def test_wait_time_keeps_token(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.updated = 0
+        assert bucket.wait_time(now=0) == 0
+        assert bucket.wait_time(now=0) == 0, 'wait_time не забирает токен'
+        bucket.reserve(now=0)
+        assert bucket.wait_time(now=0) == 1
+
+
+class TestKeyedBuckets:
+
+    def test_bucket_per_key(self):
+        buckets = KeyedBuckets(rate=1, capacity=1)
+        assert buckets.get('a') is buckets.get('a')
+        assert buckets.get('a') is not buckets.get('b')
+
+    def test_prune_idle(self):
+        buckets = KeyedBuckets(rate=1, capacity=1, prune_size=2)
+        buckets.get('busy').reserve()
+        buckets.get('idle')
+        buckets.get('new')
+        assert len(buckets) == 2, 'Полные вёдра забываются'
+        assert buckets.get('busy').wait_time() > 0, (
+            'Ведро с израсходованными токенами остаётся'
+        )
+
+
+class TestPriorityLimiter:
+
+    def test_priority_order(self):
+        order = []
+
+        async def inner():
+            limiter = PriorityLimiter(rate=100, capacity=1)
+            await limiter.acquire()
+
+            async def waiter(name, priority):
+                await limiter.acquire(priority)
+                order.append(name)
+
+            await asyncio.gather(
+                waiter('idle', 1), waiter('idle', 1), waiter('reviewing', 0)
+            )
+
+        asyncio.run(inner())
+        assert order[0] == 'reviewing', (
+            'При исчерпанном лимите первыми обслуживаются работы на ревью'
+        )
+
+    def test_cancelled_waiter_skipped(self):
+        async def inner():
+            limiter = PriorityLimiter(rate=100, capacity=1)
+            await limiter.acquire()
+            cancelled = asyncio.ensure_future(limiter.acquire(0))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.wait_for(limiter.acquire(1), 1)
+            return len(limiter)
+
+        assert asyncio.run(inner()) == 0
+
+
+class TestApiLimiter:
+
+    def test_per_token_limit(self):
+        async def inner():
+            limiter = ApiLimiter(global_rate=0, token_rate=20, token_burst=1)
+            started = time.monotonic()
+            for _ in range(3):
+                await limiter.acquire('a')
+            await limiter.acquire('b')
+            return time.monotonic() - started
+
+        assert asyncio.run(inner()) >= 0.09, (
+            'Запросы одного токена должны ограничиваться его лимитом'
+        )
+
+    def test_waited_time_returned(self):
+        async def inner():
+            limiter = ApiLimiter(global_rate=20, global_burst=1, token_rate=0)
+            await limiter.acquire('a')
+            return await limiter.acquire('b')
+
+        assert asyncio.run(inner()) > 0.03
+
+    def test_global_rate_below_one(self):
+        limiter = ApiLimiter(global_rate=0.5, global_burst=0.5, token_rate=0)
+        assert asyncio.run(asyncio.wait_for(limiter.acquire('a'), 1)) < 1, (
+            'API_GLOBAL_RATE меньше 1 не должен останавливать опрос'
+        )
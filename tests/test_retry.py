@@ -0,0 +1,174 @@
+import asyncio
+import functools
+
+import pytest
+import requests
+
+import engine
+import homework
+import retry
+from exceptions import ApiTimeoutError
+from retry import LatencyTracker, hedged, with_retries
+
+
+class TestRetries:
+
+    def test_retry_until_success(self):
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ApiTimeoutError('таймаут')
+            return 'ответ'
+
+        result = asyncio.run(
+            with_retries(flaky, ApiTimeoutError, retries=2, backoff=0.001)
+        )
+        assert result == 'ответ'
+        assert len(attempts) == 3
+
+    def test_retries_bounded(self):
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            raise ApiTimeoutError('таймаут')
+
+        with pytest.raises(ApiTimeoutError):
+            asyncio.run(
+                with_retries(failing, ApiTimeoutError, retries=2, backoff=0)
+            )
+        assert len(attempts) == 3, 'Число повторов должно быть ограничено'
+
+    def test_other_errors_not_retried(self):
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            raise KeyError('поле')
+
+        with pytest.raises(KeyError):
+            asyncio.run(with_retries(failing, ApiTimeoutError, backoff=0))
+        assert len(attempts) == 1
+
+
+class TestHedging:
+
+    def test_hedge_wins_over_slow_request(self):
+        delays = [1, 0]
+        started = []
+
+        async def request():
+            started.append(1)
+            await asyncio.sleep(delays.pop(0))
+            return len(started)
+
+        result = asyncio.run(asyncio.wait_for(hedged(request, 0.01), 0.5))
+        assert result == 2, (
+            'Если первый запрос не успел, ответ берётся у подстраховочного'
+        )
+
+    def test_no_hedge_for_fast_request(self):
+        started = []
+
+        async def request():
+            started.append(1)
+            return 'ответ'
+
+        assert asyncio.run(hedged(request, 0.1)) == 'ответ'
+        assert len(started) == 1
+
+    def test_failed_hedge_waits_for_other(self):
+        calls = []
+
+        async def request():
+            calls.append(1)
+            if len(calls) == 2:
+                raise ApiTimeoutError('таймаут')
+            await asyncio.sleep(0.05)
+            return 'ответ'
+
+        assert asyncio.run(hedged(request, 0.01)) == 'ответ'
+
+    def test_percentile(self):
+        tracker = LatencyTracker(min_samples=10)
+        assert tracker.percentile(0.95) is None
+        for value in range(100):
+            tracker.observe(value)
+        assert tracker.percentile(0.95) == 95
+
+
+class CountingLimiter:
+
+    def __init__(self):
+        self.acquired = 0
+
+    async def acquire(self, token, priority=0):
+        self.acquired += 1
+        return 0
+
+
+def run_request():
+    limiter = CountingLimiter()
+
+    async def inner():
+        eng = engine.Engine(None, [], api_limiter=limiter)
+        return await eng.request(engine.PollJob('default', 'token', 1), 0)
+
+    return asyncio.run(inner()), limiter.acquired
+
+
+class TestEngineLimits:
+
+    def test_every_retry_takes_token(self, monkeypatch):
+        answers = [ApiTimeoutError('таймаут'), ApiTimeoutError('таймаут'), {}]
+
+        async def flaky_fetch(*args):
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', flaky_fetch)
+        monkeypatch.setattr(engine, 'with_retries', functools.partial(
+            retry.with_retries, retries=2, backoff=0
+        ))
+        assert run_request() == ({}, 3), (
+            'Каждый повтор запроса берёт свой токен лимита'
+        )
+
+    def test_hedge_takes_token(self, monkeypatch):
+        delays = [1, 0]
+
+        async def slow_fetch(*args):
+            await asyncio.sleep(delays.pop(0))
+            return {}
+
+        monkeypatch.setattr(engine, 'fetch_api_answer', slow_fetch)
+        monkeypatch.setattr(engine, 'API_HEDGE', True)
+        monkeypatch.setattr(
+            retry.LatencyTracker, 'percentile', lambda self, share: 0.01
+        )
+        assert run_request() == ({}, 2), (
+            'Подстраховочный запрос тоже берёт токен лимита'
+        )
+
+
+class TestSyncTimeouts:
+
+    def test_timeout_surfaces_as_typed_error(self, monkeypatch):
+        calls = []
+
+        def hanging_get(*args, **kwargs):
+            calls.append(kwargs['timeout'])
+            raise requests.Timeout('read timeout')
+
+        monkeypatch.setattr(requests, 'get', hanging_get)
+        monkeypatch.setattr(homework, 'API_RETRY_BACKOFF', 0)
+        with pytest.raises(ApiTimeoutError):
+            homework.get_api_answer(0)
+        assert calls[0] == (
+            homework.API_CONNECT_TIMEOUT, homework.API_READ_TIMEOUT
+        ), 'Запрос к API должен делаться с таймаутами'
+        assert len(calls) == homework.API_RETRIES + 1
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from scheduler import Scheduler
+
+
+class TestScheduler:
+
+    def test_spread_within_window(self):
+        scheduler = Scheduler(interval=100, jitter=0)
+        scheduler.spread(range(10))
+        offsets = sorted(due for due, _, _ in scheduler._heap)
+        assert offsets[-1] - offsets[0] < 100, (
+            'Первые запросы должны укладываться в окно RETRY_TIME'
+        )
+        gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+        assert max(gaps) < 20, 'Запросы не должны собираться в пачки'
+        assert offsets[0] <= time.monotonic(), (
+            'Первый запрос после запуска делается сразу'
+        )
+
+    def test_next_due_order(self):
+        scheduler = Scheduler(interval=100)
+        scheduler.add('late', 0.02)
+        scheduler.add('early', 0)
+
+        async def take_two():
+            return [await scheduler.next_due(), await scheduler.next_due()]
+
+        assert asyncio.run(take_two()) == ['early', 'late']
+
+
+class Job:
+
+    def __init__(self, tenant_id='t', errors=0, reviewing=False,
+                 changed_at=0):
+        self.tenant_id = tenant_id
+        self.errors = errors
+        self.reviewing = reviewing
+        self.changed_at = changed_at
+
+
+class TestAdaptiveInterval:
+
+    def make_scheduler(self, **kwargs):
+        kwargs.setdefault('budget', 0)
+        return Scheduler(
+            interval=600, min_interval=60, max_interval=3600, **kwargs
+        )
+
+    def test_reviewing_is_faster(self):
+        scheduler = self.make_scheduler()
+        assert scheduler.interval_for(Job(reviewing=True), now=1) < 600, (
+            'Пока работа на ревью, опрашивать нужно чаще'
+        )
+
+    def test_backoff_after_errors(self):
+        scheduler = self.make_scheduler()
+        intervals = [
+            scheduler.interval_for(Job(errors=errors), now=1)
+            for errors in range(4)
+        ]
+        assert intervals == [600, 1200, 2400, 3600], (
+            'После ошибок интервал растёт вдвое, но не выше максимума'
+        )
+
+    def test_idle_is_slower(self):
+        scheduler = self.make_scheduler()
+        now = 3600 * 24 * 365
+        assert scheduler.interval_for(Job(), now=now) > 600
+
+    def test_budget_stretches_intervals(self):
+        scheduler = self.make_scheduler(budget=10)
+        intervals = [
+            scheduler.interval_for(Job(tenant_id=str(index)), now=1)
+            for index in range(20)
+        ]
+        assert 3600 / intervals[-1] * 20 <= 10 + 1e-6, (
+            'Суммарная частота не должна превышать бюджет'
+        )
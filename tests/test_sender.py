@@ -0,0 +1,111 @@
+import asyncio
+
+from telegram.error import RetryAfter
+
+import sender
+
+
+class FlakyBot:
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.messages = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.messages.append((chat_id, text))
+
+
+def deliver(bot, count=1, **kwargs):
+    results = []
+
+    async def inner():
+        telegram_sender = sender.TelegramSender(bot, **kwargs)
+        telegram_sender.start()
+        for index in range(count):
+            telegram_sender.submit(index, 'текст', results.append)
+        await telegram_sender.join()
+        await telegram_sender.stop()
+
+    asyncio.run(inner())
+    return results
+
+
+class TestTelegramSender:
+
+    def test_retry_after_is_honoured(self):
+        bot = FlakyBot([RetryAfter(0.05)])
+        assert deliver(bot) == [True], (
+            'После 429 сообщение нужно отправить повторно'
+        )
+        assert bot.messages == [(0, 'текст')]
+
+    def test_failure_reported(self, monkeypatch):
+        monkeypatch.setattr(sender, 'SEND_RETRIES', 2)
+        bot = FlakyBot([Exception('сбой')] * 2)
+        assert deliver(bot, chat_rate=100) == [False], (
+            'После исчерпания попыток callback получает False'
+        )
+
+    def test_global_rate(self):
+        bot = FlakyBot([])
+        loop_time = []
+
+        async def inner():
+            telegram_sender = sender.TelegramSender(bot, global_rate=20)
+            telegram_sender.start()
+            start = asyncio.get_running_loop().time()
+            for chat_id in range(30):
+                telegram_sender.submit(chat_id, 'текст')
+            await telegram_sender.join()
+            loop_time.append(asyncio.get_running_loop().time() - start)
+            await telegram_sender.stop()
+
+        asyncio.run(inner())
+        assert loop_time[0] >= 0.45, (
+            'Общая частота отправки не должна превышать global_rate'
+        )
+
+    def test_busy_chat_does_not_block_others(self):
+        bot = FlakyBot([])
+        delivered_at = {}
+
+        async def inner():
+            loop = asyncio.get_running_loop()
+            telegram_sender = sender.TelegramSender(
+                bot, workers=4, chat_rate=10, chat_burst=3
+            )
+            telegram_sender.start()
+            start = loop.time()
+            for index in range(12):
+                telegram_sender.submit('A', index)
+            telegram_sender.submit('B', 'текст', lambda delivered: (
+                delivered_at.setdefault('B', loop.time() - start)
+            ))
+            await telegram_sender.join()
+            delivered_at['A'] = loop.time() - start
+            await telegram_sender.stop()
+
+        asyncio.run(inner())
+        assert delivered_at['B'] < 0.1, (
+            'Сообщение в свободный чат не должно ждать токенов занятого'
+        )
+        assert delivered_at['A'] >= 0.85, (
+            'Частота отправки в один чат не должна превышать chat_rate'
+        )
+        assert [text for chat_id, text in bot.messages if chat_id == 'A'] == (
+            list(range(12))
+        ), 'Сообщения в один чат должны уходить по порядку'
+
+    def test_queue_full(self):
+        async def inner():
+            telegram_sender = sender.TelegramSender(
+                FlakyBot([]), queue_size=1
+            )
+            telegram_sender.start()
+            await telegram_sender.stop()
+            telegram_sender.submit(1, 'первое')
+            return telegram_sender.submit(1, 'второе')
+
+        assert asyncio.run(inner()) is False
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import shards
+from tenants import Tenant
+
+
+def make_tenants(count):
+    return [Tenant(str(number), 'token', number) for number in range(count)]
+
+
+def fake_shard(index, tenants, reports, interval, shard_count):
+    reports.put({
+        'shard': index, 'pid': 0, 'time': time.time(),
+        'jobs': len(tenants), 'polls': 1, 'errors': 0, 'sent': 0, 'queue': 0,
+    })
+
+
+class TestHashRing:
+
+    def test_every_tenant_assigned_once(self):
+        tenants = make_tenants(1000)
+        assignment = shards.HashRing(4).assign(tenants)
+        assigned = sum(assignment.values(), [])
+        assert sorted(assigned) == sorted(tenants)
+        assert all(len(part) > 150 for part in assignment.values()), (
+            'Студенты должны распределяться по шардам примерно поровну'
+        )
+
+    def test_stable_assignment(self):
+        assert (
+            shards.HashRing(3).shard_for('42')
+            == shards.HashRing(3).shard_for('42')
+        ), 'Шард студента не должен зависеть от процесса'
+
+    def test_few_tenants_move(self):
+        tenants = make_tenants(2000)
+        before, after = shards.HashRing(4), shards.HashRing(5)
+        moved = [
+            tenant for tenant in tenants
+            if before.shard_for(tenant.id) != after.shard_for(tenant.id)
+        ]
+        assert len(moved) < len(tenants) * 0.3, (
+            'При добавлении шарда должна переезжать малая доля студентов'
+        )
+        assert all(after.shard_for(tenant.id) == 4 for tenant in moved), (
+            'Переезжать можно только на новый шард'
+        )
+
+    def test_invalid_shards(self):
+        with pytest.raises(ValueError):
+            shards.HashRing(0)
+
+
+class TestSupervisor:
+
+    def test_collects_reports_and_restarts(self):
+        supervisor = shards.Supervisor(
+            make_tenants(10), 2, target=fake_shard, interval=0.1
+        )
+        supervisor.start()
+        try:
+            deadline = time.time() + 10
+            while len(supervisor.health) < 2 and time.time() < deadline:
+                supervisor.collect(0.1)
+            assert supervisor.totals()['jobs'] == 10, (
+                'Супервизор должен собрать отчёты всех шардов'
+            )
+            first = supervisor.processes[0]
+            first.join()
+            supervisor.check()
+            assert supervisor.processes[0] is not first, (
+                'Завершившийся шард нужно перезапустить'
+            )
+        finally:
+            supervisor.stop()
+
+
+class TestShardLimits:
+
+    def test_global_rates_are_split(self, monkeypatch):
+        monkeypatch.setattr(shards, 'TELEGRAM_GLOBAL_RATE', 30)
+        monkeypatch.setattr(shards, 'API_GLOBAL_RATE', 10)
+        monkeypatch.setattr(shards, 'API_GLOBAL_BURST', 10)
+        sender, api_limiter = shards.shard_limiters(None, 3)
+        assert sender.global_bucket.rate == 10, (
+            'Общий лимит Телеграма делится между шардами'
+        )
+        assert api_limiter.global_limiter.bucket.rate == 10 / 3, (
+            'Общий лимит API делится между шардами'
+        )
+        assert api_limiter.token_rate == shards.ApiLimiter().token_rate, (
+            'Лимит на токен не делится: токен опрашивает один шард'
+        )
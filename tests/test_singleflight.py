@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_request(self):
+        calls = []
+
+        async def fetch(token, from_date):
+            calls.append((token, from_date))
+            await asyncio.sleep(0.01)
+            return {'current_date': from_date}
+
+        async def inner():
+            flights = SingleFlight(ttl=60)
+            results = await asyncio.gather(*(
+                flights.do(('token', 1), fetch, 'token', 1) for _ in range(10)
+            ))
+            cached = await flights.do(('token', 1), fetch, 'token', 1)
+            other = await flights.do(('token', 2), fetch, 'token', 2)
+            return results, cached, other
+
+        results, cached, other = asyncio.run(inner())
+        assert calls == [('token', 1), ('token', 2)], (
+            'Одновременные вызовы с одним ключом должны делать один запрос'
+        )
+        assert all(result is results[0] for result in results)
+        assert cached is results[0], 'Повтор в пределах ttl берётся из кэша'
+        assert other == {'current_date': 2}
+
+    def test_uncached_call_skips_cache(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        async def inner():
+            flights = SingleFlight(ttl=60)
+            await flights.do('key', fetch)
+            shared = await asyncio.gather(
+                flights.do('key', fetch, cached=False),
+                flights.do('key', fetch, cached=False),
+            )
+            return shared, await flights.do('key', fetch)
+
+        shared, cached = asyncio.run(inner())
+        assert shared == [2, 2], (
+            'Без кэша вызов идёт к API, но ждёт уже выполняющийся запрос'
+        )
+        assert cached == 2 and len(calls) == 2
+
+    def test_errors_not_cached(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            raise ValueError('сбой')
+
+        async def inner():
+            flights = SingleFlight(ttl=60)
+            for _ in range(2):
+                with pytest.raises(ValueError):
+                    await flights.do('key', fetch)
+            return len(flights)
+
+        assert asyncio.run(inner()) == 0
+        assert len(calls) == 2, 'Ошибка не должна кэшироваться'
+
+    def test_waiter_cancel_keeps_request(self):
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 'ответ'
+
+        async def inner():
+            flights = SingleFlight(ttl=60)
+            first = asyncio.ensure_future(flights.do('key', fetch))
+            second = asyncio.ensure_future(flights.do('key', fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(inner()) == 'ответ', (
+            'Отмена одного ожидающего не должна отменять запрос остальным'
+        )
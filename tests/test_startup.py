@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import time
+
+import telegram
+
+import homework
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartup:
+
+    def test_heavy_imports_deferred(self):
+        code = (
+            'import sys, engine; '
+            'print(*(name in sys.modules for name in ("telegram", "requests")))'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, check=True,
+            capture_output=True, text=True
+        ).stdout
+        assert output.split() == ['False', 'False'], (
+            'telegram и requests не должны импортироваться при запуске движка'
+        )
+
+    def test_bot_built_once(self, monkeypatch):
+        built = []
+
+        class Bot:
+            def __init__(self, token):
+                built.append(token)
+
+            def send_message(self, chat_id, text):
+                return text
+
+        monkeypatch.setattr(telegram, 'Bot', Bot)
+        bot = homework.LazyBot('token')
+        assert built == [], 'Бот должен создаваться при первом обращении'
+        bot.send_message(1, 'a')
+        bot.send_message(1, 'b')
+        assert built == ['token'], 'Бот должен создаваться один раз'
+
+    def test_process_started_at(self):
+        assert homework.process_started_at() <= time.time()
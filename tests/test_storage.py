@@ -0,0 +1,87 @@
+import os
+
+from storage import Store
+
+
+class TestStore:
+
+    def test_connection_is_lazy(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        Store(path)
+        assert not os.path.exists(path), (
+            'База должна открываться только при первом обращении'
+        )
+
+    def test_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = Store(path)
+        store.save_cursor('t1', 100, 50, 'ошибка')
+        store.save_status('t1', 123, 'approved', 'hw1')
+        store.save_status('t1', 'hw', 'reviewing')
+        kept = store.add_pending('t1', 'первое')
+        sent = store.add_pending('t1', 'второе')
+        store.flush()
+        store.remove_pending(sent)
+        store.flush()
+        store.close()
+
+        state = Store(path).load('t1')
+        assert (state.cursor, state.synced_at) == (100, 50)
+        assert state.previos_message == 'ошибка'
+        assert state.statuses == {123: 'approved', 'hw': 'reviewing'}, (
+            'Ключи работ должны сохранять свой тип'
+        )
+        assert state.pending == [(kept, 'первое')]
+
+    def test_changed_at_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = Store(path)
+        store.save_cursor('t1', 100, 50, '', 1234.5)
+        store.flush()
+        store.close()
+        assert Store(path).load('t1').changed_at == 1234.5, (
+            'Время последнего изменения должно пережить перезапуск'
+        )
+
+    def test_old_cursors_table_is_migrated(self, tmp_path):
+        import sqlite3
+
+        path = str(tmp_path / 'state.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE cursors (tenant_id TEXT PRIMARY KEY, '
+            "cursor INTEGER, synced_at INTEGER, "
+            "previos_message TEXT NOT NULL DEFAULT '')"
+        )
+        connection.execute("INSERT INTO cursors VALUES ('t1', 100, 50, '')")
+        connection.commit()
+        connection.close()
+
+        store = Store(path)
+        assert store.load('t1').changed_at is None
+        store.save_cursor('t1', 200, 50, '', 1234.5)
+        store.flush()
+        assert store.load('t1')[:4] == (200, 50, '', 1234.5)
+
+    def test_unknown_tenant(self, tmp_path):
+        state = Store(str(tmp_path / 'state.sqlite3')).load('nobody')
+        assert state.cursor is None and state.statuses == {}
+
+    def test_failed_write_is_kept(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = Store(path)
+        store.save_cursor('t1', 100, 50, '')
+        kept = store.add_pending('t1', 'первое')
+        sent = store.add_pending('t1', 'второе')
+        batch = store.take_batch()
+        store.save_cursor('t1', 200, 50, '')
+        store.remove_pending(sent)
+        store.restore(batch)
+        store.flush()
+
+        state = store.load('t1')
+        assert state.cursor == 200, 'Новый курсор не затирается старой пачкой'
+        assert state.pending == [(kept, 'первое')], (
+            'Незаписанное уведомление должно дождаться следующей записи, '
+            'а отправленное за это время — не появиться'
+        )
@@ -0,0 +1,38 @@
+import json
+import sqlite3
+
+import pytest
+
+import tenants
+
+
+class TestTenants:
+
+    def test_load_json(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'id': 1, 'token': 'a', 'chat_id': 10},
+            {'id': 2, 'token': 'b', 'chat_id': 20},
+        ]))
+        loaded = tenants.load_tenants(str(path))
+        assert loaded == [
+            tenants.Tenant('1', 'a', 10), tenants.Tenant('2', 'b', 20)
+        ], 'Проверьте загрузку реестра студентов из JSON'
+
+    def test_load_sqlite(self, tmp_path):
+        path = str(tmp_path / 'tenants.db')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE tenants (id, token, chat_id)')
+        connection.execute("INSERT INTO tenants VALUES (1, 'a', 10)")
+        connection.commit()
+        connection.close()
+        assert tenants.load_tenants(path) == [tenants.Tenant('1', 'a', 10)]
+
+    def test_duplicate_tenant(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'id': 1, 'token': 'a', 'chat_id': 10},
+            {'id': 1, 'token': 'b', 'chat_id': 20},
+        ]))
+        with pytest.raises(KeyError):
+            tenants.load_tenants(str(path))
@@ -0,0 +1,65 @@
+import pytest
+
+from exceptions import ResponseKeyError, ResponseTypeError
+from validation import Homework, loads, validate_response
+
+
+class TestValidateResponse:
+
+    def test_valid_response(self):
+        homeworks, current_date = validate_response({
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+                 'date_updated': '2022-01-01T00:00:00Z', 'lesson_name': 'x'},
+                {'homework_name': 'hw2', 'status': 'reviewing'},
+            ],
+            'current_date': 100,
+        })
+        assert current_date == 100
+        assert homeworks == [
+            Homework(1, 'hw1', 'approved', '2022-01-01T00:00:00Z'),
+            Homework(None, 'hw2', 'reviewing'),
+        ]
+        assert homeworks[1].key == 'hw2', (
+            'Без id ключом работы должно быть её название'
+        )
+
+    def test_missing_field_path(self):
+        with pytest.raises(KeyError) as error:
+            validate_response({'homeworks': [
+                {'homework_name': 'hw1', 'status': 'approved'},
+                {'homework_name': 'hw2'},
+            ], 'current_date': 1})
+        assert isinstance(error.value, ResponseKeyError)
+        assert error.value.field == 'homeworks[1].status', (
+            'Ошибка должна указывать путь к отсутствующему полю'
+        )
+
+    def test_missing_current_date(self):
+        with pytest.raises(ResponseKeyError) as error:
+            validate_response({'homeworks': []})
+        assert error.value.field == 'current_date'
+
+    def test_wrong_type(self):
+        with pytest.raises(TypeError) as error:
+            validate_response({'homeworks': [
+                {'homework_name': 'hw1', 'status': 5},
+            ], 'current_date': 1})
+        assert isinstance(error.value, ResponseTypeError)
+        assert 'homeworks[0].status' in str(error.value)
+
+    def test_not_dict(self):
+        with pytest.raises(ResponseTypeError):
+            validate_response([])
+        with pytest.raises(ResponseTypeError):
+            validate_response({'homeworks': {}, 'current_date': 1})
+
+    def test_as_dict_matches_api(self):
+        homework = Homework(1, 'hw1', 'approved')
+        assert homework.as_dict()['homework_name'] == 'hw1'
+        assert not hasattr(homework, '__dict__'), (
+            'Запись должна хранить поля в __slots__'
+        )
+
+    def test_loads(self):
+        assert loads(b'{"current_date": 1}') == {'current_date': 1}
@@ -1,6 +1,9 @@
+import asyncio
 from inspect import signature
 from types import ModuleType
 
+import engine
+
 
 def check_function(scope: ModuleType, func_name: str, params_qty: int = 0):
     """Checks if scope has a function with specific name and params with qty"""
@@ -37,3 +40,37 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+
+class MockBot:
+    """Bot that records sent messages as (chat_id, text) pairs"""
+
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.messages.append((chat_id, text))
+
+    @property
+    def texts(self):
+        return [text for _, text in self.messages]
+
+
+def run_polls(bot, jobs, polls, **engine_kwargs):
+    """Polls every job `polls` times, waiting for notifications each round.
+
+    Returns the engine after its state has been flushed.
+    """
+    async def inner():
+        eng = engine.Engine(bot, jobs, **engine_kwargs)
+        eng.sender.start()
+        for _ in range(polls):
+            for job in jobs:
+                await eng.poll(job)
+            await eng.outbox.drain()
+            await eng.sender.join()
+        await eng.flush_state()
+        await eng.sender.stop()
+        return eng
+
+    return asyncio.run(inner())
@@ -0,0 +1,103 @@
+import json
+
+from exceptions import ResponseKeyError, ResponseTypeError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """Разбираю JSON ответа, через orjson, если он установлен."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Homework:
+    """Работа из ответа API: только поля, нужные боту."""
+
+    __slots__ = ('id', 'name', 'status', 'date')
+
+    def __init__(self, id, name, status, date=None):
+        self.id = id
+        self.name = name
+        self.status = status
+        self.date = date
+
+    def __eq__(self, other):
+        """Работы равны, если равны все поля."""
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return (
+            (self.id, self.name, self.status, self.date)
+            == (other.id, other.name, other.status, other.date)
+        )
+
+    def __repr__(self):
+        """Представление для логов и отладки."""
+        return (
+            f'Homework(id={self.id!r}, name={self.name!r}, '
+            f'status={self.status!r}, date={self.date!r})'
+        )
+
+    @property
+    def key(self):
+        """Ключ работы: id из ответа API, иначе её название."""
+        return self.name if self.id is None else self.id
+
+    def as_dict(self):
+        """Работа в виде словаря, как в ответе API."""
+        return {
+            'id': self.id, 'homework_name': self.name,
+            'status': self.status, 'date_updated': self.date,
+        }
+
+
+def field_path(index, name):
+    """Путь к полю для сообщения об ошибке."""
+    if index is None:
+        return name
+    return f'homeworks[{index}].{name}'
+
+
+def field(mapping, name, index, kinds, required=True):
+    """Значение поля с проверкой наличия и типа.
+
+    Путь к полю собирается только при ошибке, чтобы корректный ответ
+    не порождал лишних строк.
+    """
+    value = mapping.get(name)
+    if value is None:
+        if required:
+            raise ResponseKeyError(field_path(index, name))
+        return None
+    if not isinstance(value, kinds):
+        expected = '|'.join(kind.__name__ for kind in kinds)
+        raise ResponseTypeError(field_path(index, name), expected, value)
+    return value
+
+
+def validate_response(response):
+    """Проверяю ответ API за один проход.
+
+    Возвращаю список Homework и current_date. Ошибка указывает путь
+    к полю, например homeworks[2].status.
+    """
+    if not isinstance(response, dict):
+        raise ResponseTypeError('ответ', 'dict', response)
+    homeworks = field(response, 'homeworks', None, (list,))
+    current_date = field(response, 'current_date', None, (int,))
+    records = []
+    append = records.append
+    for index, homework in enumerate(homeworks):
+        if not isinstance(homework, dict):
+            raise ResponseTypeError(f'homeworks[{index}]', 'dict', homework)
+        append(Homework(
+            field(homework, 'id', index, (int, str), required=False),
+            field(homework, 'homework_name', index, (str,)),
+            field(homework, 'status', index, (str,)),
+            field(homework, 'date_updated', index, (str,), required=False),
+        ))
+    return records, current_date